@@ -1,12 +1,54 @@
-from io import StringIO
-from typing import Any
+import os
+import shutil
 
 import streamlit as st
 
-from chatscroll.parser import ChatParser
+from chatscroll.cache import DiskCache, parse_chat_cached
+from chatscroll.plots import FigureCache, WordcloudRenderer
+from chatscroll.stats import ChatIndex, build_chat_frame, build_rollup
 from views import activity, content, user, chat2chat, search
 
 
+@st.cache_resource
+def get_chat_cache() -> DiskCache:
+    """
+    Parsed chats cache shared by all sessions, bounded to `CHATSCROLL_CHAT_CACHE_MB` megabytes (1024 by default).
+    """
+    return DiskCache("./.chat_cache", max_bytes=int(os.environ.get("CHATSCROLL_CHAT_CACHE_MB", 1024)) * 2**20)
+
+
+@st.cache_resource
+def get_index_cache() -> DiskCache:
+    """
+    Retrieval indexes cache shared by all sessions, bounded to `CHATSCROLL_INDEX_CACHE_MB` megabytes (2048 by
+    default).
+    """
+    index_cache = DiskCache("./.index_cache",
+                            max_bytes=int(os.environ.get("CHATSCROLL_INDEX_CACHE_MB", 2048)) * 2**20)
+    # FAISS indexes saved before the cache had a budget are never evicted, drop them
+    for name in os.listdir(index_cache.base_dir):
+        if name.startswith("faiss_index_"):
+            shutil.rmtree(index_cache.entry_path(name), ignore_errors=True)
+    return index_cache
+
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    """
+    Plotly figures cache shared by all pages and sessions, bounded to `CHATSCROLL_FIGURE_CACHE_MB` megabytes (64 by
+    default).
+    """
+    return FigureCache(max_bytes=int(os.environ.get("CHATSCROLL_FIGURE_CACHE_MB", 64)) * 2**20)
+
+
+@st.cache_resource
+def get_wordcloud_renderer() -> WordcloudRenderer:
+    """
+    Background wordcloud renderer shared by all pages and sessions.
+    """
+    return WordcloudRenderer()
+
+
 def main():
     """
     Streamlit app entry point.
@@ -24,19 +66,28 @@ def main():
     if "chat" not in st.session_state:
         st.markdown("<h2 style='text-align: center;'>ChatScroll 🗣️📜</h2>", unsafe_allow_html=True)
 
-        uploaded_file = st.file_uploader("Upload your WhatsApp chat (.txt)", type=["txt"])
+        uploaded_file = st.file_uploader(
+            "Upload your WhatsApp (.txt or .zip) or Telegram (.json) chat", type=["txt", "zip", "json"]
+        )
         if uploaded_file is None:
             st.warning("👆 Please upload a chat file to continue.")
             st.stop()
 
-        # Parse file and extract useful params
-        f = StringIO(uploaded_file.getvalue().decode("utf-8"))
-        parser = ChatParser(f)
-        chat: list[dict[str, Any]] = parser.chat
-        users: list[str] = parser.users
+        # Parse file (unzipping it on the fly if needed) or load it from cache and extract useful params
+        try:
+            chat, chat_key = parse_chat_cached(
+                uploaded_file, get_chat_cache(),
+                app="telegram" if uploaded_file.name.lower().endswith(".json") else None,
+                workers=int(os.environ.get("CHATSCROLL_PARSER_WORKERS", 1))
+            )
+        except ValueError as e:
+            st.error(f"📄❌ The file could not be parsed. {e}.")
+            st.stop()
+        users: list[str] = chat.users
 
         if not chat or not users:
-            st.error("📄❌ The file could not be parsed. Please upload a WhatsApp chat exported as a .txt file.")
+            st.error("📄❌ The file could not be parsed. Please upload a WhatsApp chat exported as a .txt or .zip file, "
+                     "or a Telegram chat exported as JSON.")
             st.stop()
 
         # Init session state parameters used elsewhere
@@ -46,9 +97,18 @@ def main():
         # Save useful params to session state and update
         st.session_state["chatname"] = uploaded_file.name.split(".")[0]
         st.session_state["chat"] = chat
+        st.session_state["chat_key"] = chat_key
+        st.session_state["df"] = build_chat_frame(chat)  # Shared read-only by all dashboard pages
+        st.session_state["rollup"] = build_rollup(st.session_state["df"])
+        st.session_state["index"] = ChatIndex(st.session_state["df"])
         st.session_state["users"] = users
         st.rerun()
 
+    # Figures and retrieval indexes are cached across reruns, pages and sessions
+    st.session_state["figure_cache"] = get_figure_cache()
+    st.session_state["index_cache"] = get_index_cache()
+    st.session_state["wordcloud_renderer"] = get_wordcloud_renderer()
+
     # Sidebar common to all next pages
     with st.sidebar:
         st.title("🗣️📜 ChatScroll")
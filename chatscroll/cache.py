@@ -0,0 +1,472 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import Any, BinaryIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from chatscroll.parser import PARSER_VERSION, ChatData, ChatParser, open_chat_buffer, open_chat_stream
+
+
+# Number of bytes hashed at once when fingerprinting uploads
+_HASH_BLOCK_SIZE: int = 1 << 20
+
+
+class DiskCache:
+    """
+    A size-bounded on-disk store of entries addressed by content keys.
+
+    Each entry is a directory under `base_dir`. A `manifest.json` file records the size and last use of every entry,
+    and least recently used entries are evicted once the total size goes over `max_bytes`.
+    """
+    def __init__(self, base_dir: str, max_bytes: int) -> None:
+        """
+        Args:
+            base_dir (str):
+                Directory holding the cache entries and manifest. Created if missing.
+            max_bytes (int):
+                Disk budget for all entries together, in bytes.
+        """
+        self.base_dir: str = base_dir
+        self.max_bytes: int = max_bytes
+        self._lock: threading.Lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.base_dir, "manifest.json")
+
+    def entry_path(self, key: str) -> str:
+        """
+        Args:
+            key (str): Entry key.
+
+        Returns:
+            str: Directory of the entry, whether it exists or not.
+        """
+        return os.path.join(self.base_dir, key)
+
+    def keys(self) -> list[str]:
+        """
+        Returns:
+            list[str]: Keys of all entries, most recently used first.
+        """
+        with self._lock:
+            manifest: dict[str, dict[str, Any]] = self._read_manifest()
+        return sorted(manifest, key=lambda k: manifest[k]["last_used"], reverse=True)
+
+    def get(self, key: str) -> str | None:
+        """
+        Look up an entry and mark it as recently used.
+
+        Args:
+            key (str): Entry key.
+
+        Returns:
+            str | None: Directory of the entry, or None on a cache miss.
+        """
+        with self._lock:
+            manifest: dict[str, dict[str, Any]] = self._read_manifest()
+            if key not in manifest:
+                return None
+            if not os.path.isdir(self.entry_path(key)):
+                # Entry removed by hand, forget it
+                del manifest[key]
+                self._write_manifest(manifest)
+                return None
+            manifest[key]["last_used"] = time.time()
+            self._write_manifest(manifest)
+        return self.entry_path(key)
+
+    def put(self, key: str, write: Callable[[str], None]) -> str | None:
+        """
+        Store a new entry, evicting least recently used entries if over budget.
+
+        The entry is written to a temporary directory first and then moved in place, so readers never see
+        half-written entries.
+
+        Args:
+            key (str): Entry key.
+            write (Callable[[str], None]): Function writing the entry files into the directory it receives.
+
+        Returns:
+            str | None: Directory of the entry, or None if the entry alone is over budget.
+        """
+        tmp_dir: str = tempfile.mkdtemp(prefix=f".{key}-", dir=self.base_dir)
+        try:
+            write(tmp_dir)
+            size: int = _directory_size(tmp_dir)
+            with self._lock:
+                if size > self.max_bytes:
+                    return None
+                shutil.rmtree(self.entry_path(key), ignore_errors=True)
+                os.replace(tmp_dir, self.entry_path(key))
+                manifest: dict[str, dict[str, Any]] = self._read_manifest()
+                manifest[key] = {"size": size, "last_used": time.time()}
+                self._evict(manifest)
+                self._write_manifest(manifest)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return self.entry_path(key)
+
+    def _evict(self, manifest: dict[str, dict[str, Any]]) -> None:
+        # Drop least recently used entries until the cache fits its budget
+        total: int = sum(entry["size"] for entry in manifest.values())
+        for key in sorted(manifest, key=lambda k: manifest[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= manifest.pop(key)["size"]
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+
+    def _read_manifest(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self, manifest: dict[str, dict[str, Any]]) -> None:
+        # Write atomically so that concurrent app processes never read a partial manifest
+        tmp_path: str = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class EmbeddingCache:
+    """
+    Embeddings of text chunks by one model, stored in a `DiskCache` by hash of the chunk text.
+
+    Vectors are written in segments, one per batch of newly embedded chunks, each an entry with a sorted `keys.npy`
+    array and a float32 `vectors.npy` array. Lookups memory-map the segments of the model, newest first, so a chat
+    that only grew since it was last embedded reuses the vectors of all its older chunks. Segments no chat looks up
+    anymore are evicted like any other entry.
+    """
+    def __init__(self, cache: DiskCache, model_name: str) -> None:
+        """
+        Args:
+            cache (DiskCache): The cache holding the segments, such as the retrieval indexes cache.
+            model_name (str): The embeddings model, vectors of other models are never looked up.
+        """
+        self.cache: DiskCache = cache
+        self.prefix: str = f"embeddings-{hashlib.sha256(model_name.encode()).hexdigest()[:32]}-"
+
+    @staticmethod
+    def hash_texts(texts: Sequence[str]) -> np.ndarray:
+        """
+        Args:
+            texts (Sequence[str]): Chunk texts.
+
+        Returns:
+            np.ndarray: 16 bytes key of each text.
+        """
+        return np.array([hashlib.sha256(text.encode()).digest()[:16] for text in texts], dtype="S16")
+
+    def get(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Look up cached vectors, marking the segments holding any of them as recently used.
+
+        Args:
+            keys (np.ndarray): Keys from `hash_texts`.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Mask of the keys found, and the vectors of the keys found in key order.
+        """
+        found: np.ndarray = np.zeros(len(keys), dtype=bool)
+        vectors: np.ndarray | None = None
+        for segment in self.cache.keys():
+            if found.all():
+                break
+            if not segment.startswith(self.prefix):
+                continue
+            try:
+                segment_keys: np.ndarray = np.load(os.path.join(self.cache.entry_path(segment), "keys.npy"),
+                                                   mmap_mode="r")
+                positions: np.ndarray = np.minimum(np.searchsorted(segment_keys, keys), len(segment_keys) - 1)
+                hits: np.ndarray = (segment_keys[positions] == keys) & ~found
+                if not hits.any() or self.cache.get(segment) is None:
+                    continue
+                segment_vectors: np.ndarray = np.load(os.path.join(self.cache.entry_path(segment), "vectors.npy"),
+                                                      mmap_mode="r")
+            except OSError:
+                continue  # Evicted meanwhile
+            if vectors is None:
+                vectors = np.empty((len(keys), segment_vectors.shape[1]), dtype=np.float32)
+            vectors[hits] = segment_vectors[positions[hits]]
+            found |= hits
+        return found, vectors[found] if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def put(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Store the vectors of newly embedded chunks as a new segment.
+
+        Args:
+            keys (np.ndarray): Keys from `hash_texts`.
+            vectors (np.ndarray): Vector of each key, by row.
+        """
+        keys, first = np.unique(keys, return_index=True)
+        if not len(keys):
+            return
+
+        def write(path: str) -> None:
+            np.save(os.path.join(path, "keys.npy"), keys)
+            np.save(os.path.join(path, "vectors.npy"), np.asarray(vectors, dtype=np.float32)[first])
+
+        self.cache.put(self.prefix + hashlib.sha256(keys.tobytes()).hexdigest()[:32], write)
+
+
+def _directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def hash_file(chat_file: BinaryIO) -> str:
+    """
+    Compute the content hash of an uploaded file, reading it block by block.
+
+    Args:
+        chat_file (BinaryIO): A seekable binary file. Its position is reset to the start afterwards.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    chat_file.seek(0)
+    while block := chat_file.read(_HASH_BLOCK_SIZE):
+        digest.update(block)
+    chat_file.seek(0)
+    return digest.hexdigest()
+
+
+def hash_chat(chat: ChatData | Sequence[dict[str, Any]]) -> str:
+    """
+    Compute the content hash of a parsed chat, without building a string of the whole chat.
+
+    Columnar chats are hashed straight from their array buffers, other message sequences (such as lists of message
+    dicts) one message at a time.
+
+    Args:
+        chat (ChatData | Sequence[dict[str, Any]]): The parsed chat.
+
+    Returns:
+        str: Hex digest of the chat messages.
+    """
+    digest = hashlib.sha256()
+    if not isinstance(chat, ChatData):
+        for message in chat:
+            digest.update(f"{message['time']}\x1f{message['user']}\x1f{message['message']}\x1e".encode())
+        return digest.hexdigest()
+
+    digest.update(json.dumps(chat.users).encode())
+    digest.update(np.ascontiguousarray(chat.time).view(np.int64))
+    digest.update(np.ascontiguousarray(chat.user_codes, dtype=np.int64))
+    # Message lengths, then message bytes as they lie in the data buffers, whatever the chunks of the array
+    chunks: list[tuple[pa.Array, np.ndarray]] = []
+    for chunk in chat.message.__arrow_array__().chunks:
+        offsets_type: type[np.signedinteger] = np.int64 if pa.types.is_large_string(chunk.type) else np.int32
+        offsets: np.ndarray = np.frombuffer(chunk.buffers()[1], dtype=offsets_type)[
+            chunk.offset:chunk.offset + len(chunk) + 1
+        ]
+        chunks.append((chunk, offsets))
+        digest.update(np.diff(offsets).astype(np.int64))
+    for chunk, offsets in chunks:
+        if len(chunk):
+            digest.update(chunk.buffers()[2][offsets[0]:offsets[-1]])
+    return digest.hexdigest()
+
+
+def save_chat(chat: ChatData, path: str) -> None:
+    """
+    Write a parsed chat as a Parquet file, keeping the users list in the file metadata.
+
+    Args:
+        chat (ChatData): The parsed chat.
+        path (str): Destination file.
+    """
+    table: pa.Table = pa.table({
+        "time": pa.array(chat.time, type=pa.timestamp("ns")),
+        "user_code": pa.array(chat.user_codes),
+        "message": pa.array(chat.message),
+    })
+    table = table.replace_schema_metadata({"users": json.dumps(chat.users)})
+    pq.write_table(table, path, compression="zstd")
+
+
+def load_chat(path: str) -> ChatData:
+    """
+    Read a parsed chat written by `save_chat`.
+
+    Args:
+        path (str): Parquet file.
+
+    Returns:
+        ChatData: The parsed chat.
+    """
+    table: pa.Table = pq.read_table(path, memory_map=True)
+    return ChatData(
+        time=table["time"].to_numpy(),
+        user_codes=table["user_code"].to_numpy(),
+        message=pd.arrays.ArrowStringArray(table["message"]),
+        users=json.loads(table.schema.metadata[b"users"]),
+    )
+
+
+def _load_checkpoints(entry: str) -> dict[str, Any]:
+    try:
+        with open(os.path.join(entry, "checkpoints.json"), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"parser_version": None, "timestamp_format": None, "timestamp_format_settled": False,
+                "checkpoints": []}
+
+
+def find_shared_prefix(chat_bytes: memoryview | BinaryIO,
+                       cache: DiskCache) -> tuple[str, list[int | str], Any, bytes] | None:
+    """
+    Find the cached chat sharing the longest prefix with a new upload, e.g. an older export of the same group.
+
+    The upload is read and hashed up to each checkpoint offset of the cached chats, and candidates are dropped as
+    soon as a prefix hash differs. Only checkpoint offsets are compared, so unrelated chats are ruled out after
+    reading their first checkpoint's worth of bytes. Chats parsed by other parser versions are never candidates.
+
+    Args:
+        chat_bytes (memoryview | BinaryIO): The new upload's chat text, as a buffer or as a binary stream read up to
+            the returned checkpoint.
+        cache (DiskCache): The parsed chats cache.
+
+    Returns:
+        tuple[str, list[int | str], hashlib._Hash, bytes] | None: Key of the cached chat, the shared checkpoint,
+            the running hash of the shared prefix and the bytes read past the checkpoint. None if nothing is shared.
+    """
+    candidates: dict[str, list[list[int | str]]] = {}
+    for key in cache.keys():
+        prefix: dict[str, Any] = _load_checkpoints(cache.entry_path(key))
+        if prefix.get("parser_version") == PARSER_VERSION and prefix["checkpoints"]:
+            candidates[key] = prefix["checkpoints"]
+
+    positions: dict[str, int] = {key: 0 for key in candidates}
+    digest = hashlib.sha256()
+    offset: int = 0
+    unmatched: list[bytes | memoryview] = []
+    best: tuple[str, list[int | str], Any] | None = None
+    while positions:
+        # Read and hash up to the closest checkpoint still in the race
+        target: int = min(candidates[key][position][0] for key, position in positions.items())
+        block: bytes | memoryview = chat_bytes[offset:target] if isinstance(chat_bytes, memoryview) \
+            else chat_bytes.read(target - offset)
+        unmatched.append(block)
+        digest.update(block)
+        offset += len(block)
+        if offset < target:
+            break
+
+        hexdigest: str = digest.hexdigest()
+        for key, position in list(positions.items()):
+            checkpoint: list[int | str] = candidates[key][position]
+            if checkpoint[0] != offset:
+                continue
+            if checkpoint[2] != hexdigest:
+                del positions[key]
+                continue
+            best, unmatched = (key, checkpoint, digest.copy()), []
+            if position + 1 < len(candidates[key]):
+                positions[key] = position + 1
+            else:
+                del positions[key]
+
+    if best is None:
+        return None
+    return *best, b"".join(unmatched)
+
+
+class _PrefixedReader(io.RawIOBase):
+    # Binary stream reading some bytes first and then the rest of another stream
+    def __init__(self, prefix: bytes, stream: BinaryIO) -> None:
+        super().__init__()
+        self.prefix: bytes = prefix
+        self.stream: BinaryIO = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray | memoryview) -> int:
+        if self.prefix:
+            data, self.prefix = self.prefix[:len(buffer)], self.prefix[len(buffer):]
+        else:
+            data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def parse_chat_cached(chat_file: BinaryIO, cache: DiskCache, **parser_kwargs: Any) -> tuple[ChatData, str]:
+    """
+    Load an uploaded chat from the cache, parsing and storing it on a miss.
+
+    Entries are keyed by a hash of the uploaded bytes and the parser version, so re-uploading the same export skips
+    `ChatParser` entirely, while parser changes invalidate older entries. When the upload extends a cached chat
+    (e.g. a weekly re-export of the same group), only the text after their last shared checkpoint is parsed and
+    appended to the cached messages.
+
+    Args:
+        chat_file (BinaryIO): The uploaded chat, as plain text or zipped export.
+        cache (DiskCache): The parsed chats cache.
+        **parser_kwargs: Extra `ChatParser` arguments, such as `workers`.
+
+    Returns:
+        tuple[ChatData, str]: The parsed chat and its cache key.
+    """
+    # Plain text uploads are hashed and parsed in place, zipped ones are streamed
+    buffer: memoryview | None = open_chat_buffer(chat_file)
+    upload_hash: str = hashlib.sha256(buffer).hexdigest() if buffer is not None else hash_file(chat_file)
+    key: str = hashlib.sha256(f"{PARSER_VERSION}:{upload_hash}".encode()).hexdigest()
+    entry: str | None = cache.get(key)
+    if entry is not None:
+        return load_chat(os.path.join(entry, "chat.parquet")), key
+
+    chat_bytes: memoryview | BinaryIO = buffer if buffer is not None else open_chat_stream(chat_file)
+    shared_prefix: tuple[str, list[int | str], Any, bytes] | None = find_shared_prefix(chat_bytes, cache)
+    prefix_entry: str | None = cache.get(shared_prefix[0]) if shared_prefix is not None else None
+    if prefix_entry is not None and not _load_checkpoints(prefix_entry).get("timestamp_format_settled", False):
+        # The cached chat never told day-first from month-first timestamps, the new export may, parse it all again
+        prefix_entry = None
+    parser: ChatParser
+    chat: ChatData
+    checkpoints: list[list[int | str]]
+    if prefix_entry is None:
+        chat_file.seek(0)
+        parser = ChatParser(chat_file, **parser_kwargs)
+        chat, checkpoints = parser.chat, [list(checkpoint) for checkpoint in parser.checkpoints]
+    else:
+        # Parse what follows the shared checkpoint only, then append it to the cached messages
+        _, (offset, n_messages, _), digest, unmatched = shared_prefix
+        prefix: dict[str, Any] = _load_checkpoints(prefix_entry)
+        parser = ChatParser(
+            buffer if buffer is not None
+            else io.TextIOWrapper(_PrefixedReader(unmatched, chat_bytes), encoding="utf-8", newline=""),
+            lazy=True, **parser_kwargs
+        )
+        parser.resume(offset, n_messages, digest, prefix["timestamp_format"])
+        parser.parse_chat()
+        chat = ChatData.concat([load_chat(os.path.join(prefix_entry, "chat.parquet"))[:n_messages], parser.chat])
+        checkpoints = [checkpoint for checkpoint in prefix["checkpoints"] if checkpoint[0] <= offset]
+        checkpoints += [list(checkpoint) for checkpoint in parser.checkpoints]
+
+    def write(path: str) -> None:
+        save_chat(chat, os.path.join(path, "chat.parquet"))
+        with open(os.path.join(path, "checkpoints.json"), "w") as f:
+            json.dump({"parser_version": PARSER_VERSION, "timestamp_format": parser.timestamp_format,
+                       "timestamp_format_settled": parser.timestamp_format_settled, "checkpoints": checkpoints}, f)
+
+    if len(chat):
+        cache.put(key, write)
+    return chat, key
@@ -1,17 +1,49 @@
 import datetime
+import hashlib
+import io
+import mmap
 import re
+import zipfile
+import zlib
 
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
 from io import StringIO
-from typing import Any
+from multiprocessing.connection import Connection
+from typing import Any, BinaryIO, TextIO
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 
-# Timestamp parsing formats
+from chatscroll.telegram import iter_telegram_batches
+from chatscroll.workers import WorkerProcess, serve
+
+
+# Version of the parsing output, bump it whenever parsed chats change so that cached ones are invalidated
+PARSER_VERSION: str = "3"
+
+# Timestamp parsing formats, day-first layouts take precedence over month-first ones when sniffing
 _TIMESTAMP_FORMATS: list[str] = [
     '%d.%m.%Y, %H:%M',
     '%d/%m/%Y, %H:%M',
     '%d/%m/%y, %H:%M',
+    '%m/%d/%Y, %H:%M',
+    '%m/%d/%y, %H:%M',
+    '%d.%m.%Y, %I:%M %p',
+    '%d/%m/%Y, %I:%M %p',
+    '%d/%m/%y, %I:%M %p',
+    '%m/%d/%Y, %I:%M %p',
+    '%m/%d/%y, %I:%M %p',
 ]
 
+
+def _normalize_timestamp(timestamp_str: str) -> str:
+    # Some locales separate the AM/PM marker with a narrow no-break space
+    return timestamp_str.strip().replace('\u202f', ' ')
+
+
 def parse_timestamp(timestamp_str: str) -> datetime.datetime:
     """
     Parse a timestamp string into a datetime object.
@@ -29,35 +61,516 @@ def parse_timestamp(timestamp_str: str) -> datetime.datetime:
     """
     for fmt in _TIMESTAMP_FORMATS:
         try:
-            return datetime.datetime.strptime(timestamp_str.strip(), fmt)
+            return datetime.datetime.strptime(_normalize_timestamp(timestamp_str), fmt)
         except ValueError:
             continue
     raise ValueError(f"Unrecognized timestamp format: {timestamp_str}")
 
 
-# TODO: Add Telegram support
-# https://github.com/ramcarreno/chatscroll/issues/1
+def sniff_timestamp_format(timestamp_strs: Sequence[str]) -> str:
+    """
+    Guess the timestamp format of an export from its timestamps.
+
+    Picks the known format parsing the most timestamps, trying each one on all of them at once. Ties (e.g. no day
+    above 12 in a month-first export) resolve to day-first layouts.
+
+    Args:
+        timestamp_strs (Sequence[str]): Timestamp strings from the same export.
+
+    Returns:
+        str: A `strptime` format string from the known timestamp formats.
+    """
+    normalized: list[str] = [_normalize_timestamp(timestamp_str) for timestamp_str in timestamp_strs]
+    return _TIMESTAMP_FORMATS[int(np.argmax(count_timestamp_formats(normalized)))]
+
+
+def count_timestamp_formats(timestamp_strs: Sequence[str]) -> np.ndarray:
+    """
+    Args:
+        timestamp_strs (Sequence[str]): Timestamp strings from the same export, as split from the chat.
+
+    Returns:
+        np.ndarray: Number of timestamps parsed by each of the known timestamp formats, in order.
+    """
+    return np.array([parse_timestamps(timestamp_strs, fmt).notna().sum() for fmt in _TIMESTAMP_FORMATS])
+
+
+def parse_timestamps(timestamp_strs: Sequence[str], timestamp_format: str) -> pd.DatetimeIndex:
+    """
+    Parse many timestamp strings sharing the same format in a single vectorized call.
+
+    Args:
+        timestamp_strs (Sequence[str]): The timestamp strings to parse, as split from the chat (trimmed and with
+            plain spaces before AM/PM markers).
+        timestamp_format (str): A `strptime` format string, usually from `sniff_timestamp_format`.
+
+    Returns:
+        pd.DatetimeIndex: The parsed timestamps, with NaT for strings not matching the format.
+    """
+    return pd.DatetimeIndex(pd.to_datetime(pd.Series(timestamp_strs, dtype=object), format=timestamp_format,
+                                           errors="coerce"))
+
+
+# Regex pattern to detect timestamps at the start of a message line
+_TIMESTAMP_PATTERN: re.Pattern[str] = re.compile(
+    r'(\d{1,2}[./]\d{1,2}[./]\d{2,4}, \d{1,2}:\d{2}(?:[ \u202f]?[AaPp][Mm])?) - '
+)
+
+# The same pattern over UTF-8 bytes, used to split chats without decoding them first
+_TIMESTAMP_BYTES_PATTERN: re.Pattern[bytes] = re.compile(
+    rb'(\d{1,2}[./]\d{1,2}[./]\d{2,4}, \d{1,2}:\d{2}(?:(?: |\xe2\x80\xaf)?[AaPp][Mm])?) - '
+)
+
+# Line breaks followed by a timestamp, where chat buffers can be cut into segments
+_SEGMENT_BOUNDARY_PATTERN: re.Pattern[bytes] = re.compile(rb'\n(?=' + _TIMESTAMP_BYTES_PATTERN.pattern + rb')')
+
+# Separator between user names and messages
+_COLON_PATTERN: re.Pattern[bytes] = re.compile(rb':')
+
+# Longest text a timestamp match can span, used to keep partial timestamps between reads
+_MAX_TIMESTAMP_LENGTH: int = 32
+
+# Number of characters read from the chat file at once, or bytes per segment of chat buffers
+_BLOCK_SIZE: int = 1 << 20
+
+# Types accepted as in-memory chat buffers
+_BUFFER_TYPES: tuple[type, ...] = (bytes, bytearray, memoryview, mmap.mmap)
+
+# A batch of parsed messages packed into columns: timestamps (datetime64), users (categorical) and messages (Arrow)
+Batch = tuple[np.ndarray, pd.Categorical, pa.Array]
+
+
+def open_chat_stream(chat_file: BinaryIO) -> BinaryIO:
+    """
+    Open the chat text of an uploaded export as a binary stream.
+
+    WhatsApp exports "with media" come as zip archives. In that case only the chat text member is opened, and it is
+    decompressed as it is read, so media files are never extracted nor the archive inflated in memory or on disk.
+
+    Args:
+        chat_file (BinaryIO): A seekable binary file with either a plain text chat or a zipped export.
+
+    Returns:
+        BinaryIO: The chat member of a zipped export, or `chat_file` itself rewound to the start.
+
+    Raises:
+        ValueError: If the archive is truncated or corrupted, or holds no chat text file. Corrupted chat members are
+            reported as they are read.
+    """
+    if not is_zipped_export(chat_file):
+        return chat_file
+
+    with _reading_archive():
+        archive: zipfile.ZipFile = zipfile.ZipFile(chat_file)
+        return _ArchiveMemberReader(archive.open(find_chat_member(archive)))
+
+
+def open_chat_file(chat_file: BinaryIO, encoding: str = "utf-8") -> TextIO:
+    """
+    Open an uploaded chat export as a text stream, decoding it on the fly.
+
+    Line breaks are kept untranslated, so that offsets into the text match offsets into the file. Messages are
+    normalized to `\\n` line breaks when split instead.
+
+    Args:
+        chat_file (BinaryIO): A seekable binary file with either a plain text chat or a zipped export.
+        encoding (str): Text encoding of the chat. UTF-8 by default.
+
+    Returns:
+        TextIO: A text stream over the chat.
+
+    Raises:
+        ValueError: If the archive is truncated or corrupted, or holds no chat text file.
+    """
+    return _DetachingTextWrapper(open_chat_stream(chat_file), encoding=encoding, newline="")
+
+
+def open_chat_buffer(chat_file: BinaryIO) -> memoryview | None:
+    """
+    Expose an uploaded plain text chat as a read-only buffer, without copying it.
+
+    In-memory uploads share their bytes through `getbuffer`, and files on disk are memory-mapped.
+
+    Args:
+        chat_file (BinaryIO): A seekable binary file with either a plain text chat or a zipped export.
+
+    Returns:
+        memoryview | None: The bytes of the chat, or None for zipped exports and files that can't be mapped, which
+            are read with `open_chat_file` instead.
+
+    Raises:
+        ValueError: If the upload is a truncated zip archive.
+    """
+    if is_zipped_export(chat_file):
+        return None
+    if isinstance(chat_file, io.BytesIO):
+        return chat_file.getbuffer()
+    try:
+        return memoryview(mmap.mmap(chat_file.fileno(), 0, access=mmap.ACCESS_READ))
+    except (AttributeError, OSError, ValueError):
+        # Not backed by a file descriptor, or empty
+        return None
+
+
+def is_zipped_export(chat_file: BinaryIO) -> bool:
+    """
+    Tell zipped exports from plain text ones, leaving the file rewound to the start.
+
+    Args:
+        chat_file (BinaryIO): A seekable binary file with either a plain text chat or a zipped export.
+
+    Returns:
+        bool: Whether the file is a zip archive.
+
+    Raises:
+        ValueError: If the file starts like a zip archive but has no central directory, e.g. an interrupted upload.
+    """
+    is_zipped: bool = zipfile.is_zipfile(chat_file)
+    chat_file.seek(0)
+    if not is_zipped and chat_file.read(4) == b"PK\x03\x04":
+        raise ValueError("The zipped export is truncated or corrupted")
+    chat_file.seek(0)
+    return is_zipped
+
+
+@contextmanager
+def _reading_archive() -> Iterator[None]:
+    # Damaged archives fail like any other unparseable upload
+    try:
+        yield
+    except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+        raise ValueError("The zipped export is truncated or corrupted") from e
+
+
+class _ArchiveMemberReader(io.BufferedIOBase):
+    # Reads a zip archive member, reporting corrupted data (bad CRC, deflate errors, early end) as ValueError
+    def __init__(self, member: BinaryIO) -> None:
+        super().__init__()
+        self._member: BinaryIO = member
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1) -> bytes:
+        with _reading_archive():
+            return self._member.read(size)
+
+    def read1(self, size: int = -1) -> bytes:
+        with _reading_archive():
+            return self._member.read1(size)
+
+    def close(self) -> None:
+        self._member.close()
+        super().close()
+
+
+class _DetachingTextWrapper(io.TextIOWrapper):
+    # Closing (or garbage collecting) the text stream leaves the uploaded binary file open for other readers
+    def close(self) -> None:
+        try:
+            self.detach()
+        except ValueError:
+            pass
+
+
+def find_chat_member(archive: zipfile.ZipFile) -> str:
+    """
+    Find the chat text file in a zipped export.
+
+    Looks for the `_chat.txt` member first (iOS exports), then for `WhatsApp Chat ...txt` (Android exports) and
+    finally for the single text file in the archive, if there is only one.
+
+    Args:
+        archive (zipfile.ZipFile): The zipped export.
+
+    Returns:
+        str: Name of the chat member.
+
+    Raises:
+        ValueError: If no chat text file can be identified.
+    """
+    text_members: list[str] = [
+        name for name in archive.namelist() if name.lower().endswith(".txt") and not name.endswith("/")
+    ]
+    for name in text_members:
+        if name.rsplit("/", 1)[-1] == "_chat.txt":
+            return name
+    for name in text_members:
+        if name.rsplit("/", 1)[-1].startswith("WhatsApp Chat"):
+            return name
+    if len(text_members) == 1:
+        return text_members[0]
+    raise ValueError("No chat text file found in the zipped export")
+
+
 class ChatParser:
     """
     A parser for exported chat logs from messaging apps like WhatsApp or Telegram.
 
     After initialization, the parsed messages and users (users) are available via
-    the `chat` and `users` attributes.
+    the `chat` and `users` attributes. Lazy parsers skip this step so that messages can be
+    streamed one at a time with `iter_messages`, which never holds more than a few blocks
+    of the file in memory. Splitting and parsing messages can optionally be spread over several
+    worker processes, with results identical to the serial parser.
+
+    Plain text chats in memory (bytes, memoryviews, memory maps or in-memory uploads) are split
+    directly on their UTF-8 bytes, and only the user and message fields that are kept get decoded.
+    The chat is never copied nor decoded as a whole, so peak memory stays close to the upload size.
+
+    While parsing, the parser also records `checkpoints` at message boundaries: the number of
+    bytes read so far, the number of messages parsed from them and a hash of that prefix.
+    They allow re-exports of the same chat to only parse the messages added since.
     """
-    def __init__(self, chat_file: StringIO, app=None) -> None:
+    def __init__(self, chat_file: StringIO | bytes | memoryview, app=None, block_size: int = _BLOCK_SIZE,
+                 lazy: bool = False, workers: int = 1) -> None:
         """
         Args:
-            chat_file (StringIO):
-                A text file in string format.
+            chat_file (StringIO | bytes | memoryview):
+                A text file in string format, or a UTF-8 chat buffer. Binary files are read as buffers when possible,
+                zipped exports are decoded on the fly.
             app (str):
-                Name of the app from where the chat log was exported. Whatsapp by default; Telegram support to be
-                implemented.
+                Name of the app from where the chat log was exported. Whatsapp by default, or "telegram" for JSON
+                exports from Telegram Desktop. Telegram exports are always parsed serially and without checkpoints.
+            block_size (int):
+                Number of characters read from `chat_file` at once, or minimum size of chat buffer segments.
+            lazy (bool):
+                If True, do not parse the whole chat on initialization. Use `iter_messages` to stream it instead.
+            workers (int):
+                Number of processes splitting and parsing segments. Parsing is serial by default.
         """
-        self.chat_file: StringIO = chat_file  # TODO: unzip if chat is uploaded zipped
+        self.buffer: memoryview | None = None
+        if isinstance(chat_file, _BUFFER_TYPES):
+            self.buffer = memoryview(chat_file)
+        elif isinstance(chat_file, (io.RawIOBase, io.BufferedIOBase)):
+            if app != "telegram":
+                self.buffer = open_chat_buffer(chat_file)
+            if self.buffer is None:
+                chat_file = open_chat_file(chat_file)
+        self.chat_file: StringIO | bytes | memoryview = chat_file
         self.app: str | Any = app
-        self.chat: list[dict[str, Any]] = []
+        self.block_size: int = block_size
+        self.workers: int = workers
+        self.timestamp_format: str | None = None
+        self.timestamp_format_settled: bool = False
+        self._format_counts: np.ndarray = np.zeros(len(_TIMESTAMP_FORMATS), dtype=np.int64)
+        self.chat: ChatData = ChatData.from_batches([])
         self.users: list[str] = []
-        self.parse_chat()
+
+        # Prefix of the chat text split into segments so far, and the message boundaries seen in it
+        self.offset: int = 0
+        self.n_messages: int = 0
+        self.digest: "hashlib._Hash" = hashlib.sha256()
+        self.checkpoints: list[tuple[int, int, str]] = []
+        self._segment_ends: deque[tuple[int, str, bool]] = deque()
+
+        if not lazy:
+            self.parse_chat()
+
+    def iter_segments(self) -> Iterator[str | memoryview]:
+        """
+        Read the chat file block by block and yield text segments made of whole messages only.
+
+        Every segment but the first starts at a timestamp and ends right before the next one, so multi-line messages
+        crossing a block boundary are kept together. Text preceding the first timestamp is yielded as part of the
+        first segment and discarded later on, like the head of `re.split`.
+
+        Yields:
+            str | memoryview: A chunk of the chat text holding one or more complete messages. Chat buffers yield
+                views of their bytes instead.
+        """
+        if self.buffer is not None:
+            yield from self._iter_buffer_segments()
+            return
+
+        pending: str = ""
+        while block := self.chat_file.read(self.block_size):
+            pending += block
+
+            # Only the message following the last timestamp may still continue in the next block
+            last_match: re.Match[str] | None = None
+            for last_match in _TIMESTAMP_PATTERN.finditer(pending):
+                pass
+            if last_match is None:
+                # No timestamps seen yet, keep just enough text to complete one split between blocks
+                self._consume(pending[:-_MAX_TIMESTAMP_LENGTH])
+                pending = pending[-_MAX_TIMESTAMP_LENGTH:]
+                continue
+
+            if last_match.start() > 0:
+                segment: str = pending[:last_match.start()]
+                self._consume(segment)
+                self._segment_ends.append((self.offset, self.digest.hexdigest(), segment.endswith("\n")))
+                yield segment
+                pending = pending[last_match.start():]
+
+        if pending:
+            # The end of the file is never a checkpoint, as the last message may go on in a later export
+            self._consume(pending)
+            self._segment_ends.append((self.offset, self.digest.hexdigest(), False))
+            yield pending
+
+    def _iter_buffer_segments(self) -> Iterator[memoryview]:
+        # Cut the buffer at the first line starting with a timestamp past every `block_size` bytes. Such a line break
+        # ends a message and can't be crossed by any timestamp match, so every cut is also a checkpoint
+        size: int = len(self.buffer)
+        while self.offset < size:
+            end: int = size
+            if self.offset + self.block_size < size:
+                boundary: re.Match[bytes] | None = _SEGMENT_BOUNDARY_PATTERN.search(
+                    self.buffer, self.offset + self.block_size
+                )
+                if boundary is not None:
+                    end = boundary.end()
+
+            segment: memoryview = self.buffer[self.offset:end]
+            self.digest.update(segment)
+            self.offset = end
+            self._segment_ends.append((self.offset, self.digest.hexdigest(), end < size))
+            yield segment
+
+    def _consume(self, text: str) -> None:
+        # Move the parsed prefix past a piece of text
+        encoded: bytes = text.encode("utf-8")
+        self.digest.update(encoded)
+        self.offset += len(encoded)
+
+    def iter_split_segments(self) -> Iterator[tuple[list[str], list[str], list[str]] | Batch]:
+        """
+        Split every segment into message columns, in file order.
+
+        Once the timestamp format is settled, segments are parsed into packed batches as well, see
+        `parse_segment_columns`. With several workers, segments are sent to worker processes in turn as they are
+        read. Since segments always start at a timestamp match, each one splits exactly like it would as part of the
+        whole text. A single segment per worker is in flight, so memory stays bounded by the block size.
+
+        Yields:
+            tuple[list[str], list[str], list[str]] | Batch: Unparsed timestamps, users and messages of a segment, or
+                its packed batch.
+        """
+        if self.workers <= 1:
+            for segment in self.iter_segments():
+                yield parse_segment_columns(segment, self.timestamp_format if self.timestamp_format_settled else None)
+            return
+
+        # Workers are connected to on their first segment, so that they start while the chat is read
+        workers: list[WorkerProcess] = [WorkerProcess("chatscroll.parser") for _ in range(self.workers)]
+        try:
+            # Each worker answers its segments in order, collecting them in turn keeps the file order
+            in_flight: deque[Connection] = deque()
+            for index, segment in enumerate(self.iter_segments()):
+                # Until the timestamp format is settled, segments are only split and one at a time, so that workers
+                # parse every segment after the one settling it
+                while in_flight and not self.timestamp_format_settled:
+                    yield _receive_columns(in_flight.popleft())
+                columns: tuple | None = _receive_columns(in_flight.popleft()) if len(in_flight) == self.workers \
+                    else None
+                # Views can't be pickled, workers get a copy of the segment bytes instead
+                if isinstance(segment, memoryview):
+                    segment = segment.tobytes()
+                connection: Connection = workers[index % self.workers].connect()
+                connection.send((segment, self.timestamp_format if self.timestamp_format_settled else None))
+                in_flight.append(connection)
+                if columns is not None:
+                    yield columns
+            while in_flight:
+                yield _receive_columns(in_flight.popleft())
+        finally:
+            for worker in workers:
+                worker.close()
+
+    def iter_batches(self) -> Iterator[Batch]:
+        """
+        Stream the chat file, yielding the parsed messages of each segment as a batch of packed columns.
+
+        Yields:
+            Batch: Message timestamps (as datetime64), users (as a categorical) and messages (as an Arrow array).
+        """
+        if self.app == "telegram":
+            for times, users, messages in iter_telegram_batches(self.chat_file, self.block_size):
+                yield pack_batch(times, users, messages)
+            return
+
+        # Segments are held back while their timestamps fit several formats (e.g. the first days of a month-first
+        # export), so that every message is parsed with the settled format. Packed batches come after it settled
+        pending: list[tuple[tuple[list[str], list[str], list[str]] | Batch, tuple[int, str, bool]]] = []
+        for columns in self.iter_split_segments():
+            # Segments are split in the order they were read, so their ends come out of the queue in step
+            pending.append((columns, self._segment_ends.popleft()))
+            if isinstance(columns[0], np.ndarray) or self.sniff_timestamp_format(columns[0]):
+                yield from self._parse_segments(pending)
+                pending = []
+        yield from self._parse_segments(pending)
+
+    def _parse_segments(
+        self, segments: list[tuple[tuple[list[str], list[str], list[str]] | Batch, tuple[int, str, bool]]]
+    ) -> Iterator[Batch]:
+        # Parse split segments with the export's timestamp format, recording their checkpoints
+        for columns, (segment_end, segment_digest, at_line_start) in segments:
+            batch: Batch = columns if isinstance(columns[0], np.ndarray) \
+                else parse_columns(*columns, self.timestamp_format)
+
+            # Message boundaries right after a line break can't be crossed by any timestamp match, resuming there
+            # splits the rest of the text exactly like a full parse would
+            self.n_messages += len(batch[0])
+            if at_line_start:
+                self.checkpoints.append((segment_end, self.n_messages, segment_digest))
+            if len(batch[0]):
+                yield batch
+
+    def iter_messages(self) -> Iterator[dict[str, Any]]:
+        """
+        Stream the chat file, yielding parsed messages one at a time in file order.
+        Peak memory grows with `block_size` and the longest message, not with the file size.
+
+        Yields:
+            dict[str, Any]: A message with `time`, `user` and `message` keys.
+        """
+        for timestamps, users, messages in self.iter_batches():
+            for timestamp, user, message in zip(pd.DatetimeIndex(timestamps).to_pydatetime(), users,
+                                                messages.to_pylist()):
+                yield {
+                    "time": timestamp,
+                    "user": user,
+                    "message": message
+                }
+
+    def sniff_timestamp_format(self, timestamp_strs: list[str]) -> bool:
+        """
+        Update the guess of the export's timestamp format with a batch of its timestamps.
+
+        The format is settled once a single format parses the most timestamps seen so far, and never changes after.
+        Until then, `timestamp_format` is the best guess.
+
+        Args:
+            timestamp_strs (list[str]): Timestamp strings in file order.
+
+        Returns:
+            bool: Whether the format is settled.
+        """
+        if not self.timestamp_format_settled and timestamp_strs:
+            self._format_counts += count_timestamp_formats(timestamp_strs)
+            best: int = int(np.argmax(self._format_counts))
+            self.timestamp_format = _TIMESTAMP_FORMATS[best]
+            self.timestamp_format_settled = bool((self._format_counts == self._format_counts[best]).sum() == 1)
+        return self.timestamp_format_settled
+
+    def resume(self, offset: int, n_messages: int, digest: "hashlib._Hash", timestamp_format: str | None) -> None:
+        """
+        Continue parsing a text whose prefix was already parsed, with `chat_file` positioned at a checkpoint.
+        Chat buffers are read from the checkpoint on, wherever `chat_file` is.
+        Offsets, message counts and hashes of new checkpoints then refer to the whole text.
+
+        Args:
+            offset (int): Bytes in the parsed prefix.
+            n_messages (int): Messages parsed from the prefix.
+            digest (hashlib._Hash): Running SHA-256 hash of the prefix.
+            timestamp_format (str | None): Timestamp format settled on the prefix, or None to sniff it again.
+        """
+        self.offset = offset
+        self.n_messages = n_messages
+        self.digest = digest
+        self.timestamp_format = timestamp_format
+        self.timestamp_format_settled = timestamp_format is not None
 
     def parse_chat(self) -> None:
         """
@@ -65,50 +578,336 @@ class ChatParser:
         Groups message timestamps, sender users and message contents, filling chat and users containers.
         Filters system messages, ignoring messages with no text or sender.
         """
-        # Create users set to add their names only once
-        users: set[str] = set()
+        # Store elements in columnar chat and user containers as they are streamed
+        self.chat = ChatData.from_batches(self.iter_batches())
+        self.users = self.chat.users
 
-        # Start reading
-        chat_text: str = self.chat_file.read()
 
-        # Regex pattern to detect timestamps at the start of a message line
-        # Start dividing between timestamp and rest of message
-        timestamp_pattern: str = r'(\d{1,2}[./]\d{1,2}[./]\d{2,4}, \d{1,2}:\d{2}) - '
-        parts: list[str] = re.split(timestamp_pattern, chat_text)
+class ChatData(Sequence):
+    """
+    Columnar, array-backed storage for parsed chat messages.
 
-        # Parts structure: ['', timestamp1, message1, timestamp2, message2, ...]
-        # So we iterate in steps of 2 starting at index 1 (timestamps) and get messages at index+1
-        for i in range(1, len(parts), 2):
-            timestamp_str: str = parts[i]
-            message_block: str = parts[i + 1].strip() if (i + 1) < len(parts) else ""
+    Timestamps are kept in a datetime64 array, users as integer codes into the sorted `users` list and messages in
+    a compact Arrow string array, which costs tens of bytes per message instead of a dict and a datetime object each.
+    Indexing builds message dicts with `time`, `user` and `message` keys on demand, so the container can still be
+    used as the list of dicts it replaces (e.g. by `ChatSplitter.split_messages`). Slices share memory with the
+    original columns.
+    """
+    def __init__(self, time: np.ndarray, user_codes: np.ndarray, message: pd.arrays.ArrowStringArray,
+                 users: list[str]) -> None:
+        """
+        Args:
+            time (np.ndarray):
+                Message timestamps as a datetime64[ns] array.
+            user_codes (np.ndarray):
+                Position of each message's user in `users`.
+            message (pd.arrays.ArrowStringArray):
+                Message contents.
+            users (list[str]):
+                Sorted unique user names.
+        """
+        self.time: np.ndarray = time
+        self.user_codes: np.ndarray = user_codes
+        self.message: pd.arrays.ArrowStringArray = message
+        self.users: list[str] = users
 
-            # Parse timestamp into possible dates, skipping unparseable timestamps
-            try:
-                timestamp: datetime.datetime = parse_timestamp(timestamp_str)
-            except ValueError:
-                continue
+    @classmethod
+    def from_batches(cls, batches: Iterable[Batch]) -> "ChatData":
+        """
+        Build the columnar chat from batches of packed messages, such as the ones from `ChatParser.iter_batches`.
+        Batches are already packed into arrays, so they are only recoded and concatenated.
 
-            # Split user name from message, if no separator found skip (system message)
-            if ':' not in message_block:
-                continue
+        Args:
+            batches (Iterable[Batch]):
+                Message timestamps (as datetime64), users (as a categorical) and messages (as an Arrow array) of each
+                batch, see `pack_batch`.
+
+        Returns:
+            ChatData: The columnar chat.
+        """
+        # Users are coded in order of discovery first, then recoded to match the sorted users list
+        user_index: dict[str, int] = {}
+        times: list[np.ndarray] = []
+        codes: list[np.ndarray] = []
+        messages: list[pa.Array] = []
+        for batch_times, batch_users, batch_messages in batches:
+            times.append(batch_times)
+            batch_codes: np.ndarray = np.fromiter(
+                (user_index.setdefault(user, len(user_index)) for user in batch_users.categories),
+                dtype=np.int32, count=len(batch_users.categories)
+            )
+            codes.append(batch_codes[batch_users.codes])
+            messages.append(batch_messages)
 
-            user: str
-            message: str
-            user, message = message_block.split(':', 1)
-            user = user.strip()
-            message = message.strip()
+        users: list[str] = sorted(user_index)
+        recode: np.ndarray = np.empty(len(users), dtype=_user_codes_dtype(len(users)))
+        for code, user in enumerate(users):
+            recode[user_index[user]] = code
 
-            # Clean system messages such as <Media ommitted> and skip empty messages
-            message = re.sub(r'<[^>]+>', '', message)
-            if not message:
-                continue
+        return cls(
+            time=np.concatenate(times) if times else np.array([], dtype="datetime64[ns]"),
+            user_codes=recode[np.concatenate(codes)] if codes else recode[:0],
+            message=pd.arrays.ArrowStringArray(pa.chunked_array(messages, type=pa.large_string())),
+            users=users,
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["ChatData"]) -> "ChatData":
+        """
+        Append parsed chats one after another, merging their users lists.
+
+        Args:
+            parts (Sequence[ChatData]): Chats in the order their messages should be kept.
+
+        Returns:
+            ChatData: The merged chat.
+        """
+        if not parts:
+            return cls.from_batches([])
+        users: list[str] = sorted(set().union(*(part.users for part in parts)))
+        codes_dtype: type[np.signedinteger] = _user_codes_dtype(len(users))
+        return cls(
+            time=np.concatenate([part.time for part in parts]),
+            user_codes=np.concatenate([
+                np.searchsorted(users, part.users).astype(codes_dtype)[part.user_codes] for part in parts
+            ]),
+            message=pd.arrays.ArrowStringArray(pa.chunked_array(
+                [chunk for part in parts for chunk in arrow_chunks(part.message)], type=pa.large_string()
+            )),
+            users=users,
+        )
+
+    def __len__(self) -> int:
+        return len(self.time)
 
-            # Store elements in chat and user containers
-            users.add(user)
-            self.chat.append({
+    def __getitem__(self, index: int | slice) -> "dict[str, Any] | ChatData":
+        if isinstance(index, slice):
+            return ChatData(self.time[index], self.user_codes[index], self.message[index], self.users)
+        return {
+            "time": pd.Timestamp(self.time[index]),
+            "user": self.users[self.user_codes[index]],
+            "message": self.message[index]
+        }
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for timestamp, code, message in zip(pd.DatetimeIndex(self.time), self.user_codes, self.message):
+            yield {
                 "time": timestamp,
-                "user": user,
+                "user": self.users[code],
                 "message": message
-            })
+            }
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+            int: Memory held by the message columns, in bytes.
+        """
+        return self.time.nbytes + self.user_codes.nbytes + self.message.nbytes
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Wrap the columns in a DataFrame without copying them.
+
+        Returns:
+            pd.DataFrame: A chat DataFrame with `time`, categorical `user` and `message` columns.
+        """
+        return pd.DataFrame({
+            "time": self.time,
+            "user": pd.Categorical.from_codes(self.user_codes, categories=self.users),
+            "message": self.message
+        }, copy=False)
+
+
+def arrow_chunks(array: pd.arrays.ArrowStringArray) -> list[pa.Array]:
+    # Arrow arrays backing a pandas string array, without copying them
+    arrow_array: pa.Array | pa.ChunkedArray = pa.array(array)
+    return arrow_array.chunks if isinstance(arrow_array, pa.ChunkedArray) else [arrow_array]
+
+
+def _user_codes_dtype(n_users: int) -> type[np.signedinteger]:
+    # Smallest integer type able to index all users, the same one pandas uses for categorical codes
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_users < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def split_segment(chat_text: str | bytes | memoryview) -> Iterator[tuple[str, str, str]]:
+    """
+    Split a piece of chat text holding complete messages into raw message fields.
+    Filters system messages, ignoring messages with no text or sender.
+
+    Args:
+        chat_text (str | bytes | memoryview): Chat text, ideally starting at a timestamp. UTF-8 bytes are split
+            before decoding, so that only the fields of kept messages are decoded.
+
+    Yields:
+        tuple[str, str, str]: The unparsed timestamp, the user and the message.
+    """
+    if not isinstance(chat_text, str):
+        yield from _split_bytes_segment(chat_text)
+        return
+
+    # Start dividing between timestamp and rest of message
+    parts: list[str] = _TIMESTAMP_PATTERN.split(chat_text)
+
+    # Parts structure: ['', timestamp1, message1, timestamp2, message2, ...]
+    # So we iterate in steps of 2 starting at index 1 (timestamps) and get messages at index+1
+    for i in range(1, len(parts), 2):
+        fields: tuple[str, str, str] | None = _split_message_block(
+            parts[i], parts[i + 1] if (i + 1) < len(parts) else ""
+        )
+        if fields is not None:
+            yield fields
+
+
+def _split_bytes_segment(chat_bytes: bytes | memoryview) -> Iterator[tuple[str, str, str]]:
+    # Find message blocks between timestamp matches without copying the segment. A colon byte can't be part of a
+    # multi-byte UTF-8 character, so blocks without a user separator are skipped before decoding them
+    matches: list[re.Match[bytes]] = list(_TIMESTAMP_BYTES_PATTERN.finditer(chat_bytes))
+    for i, match in enumerate(matches):
+        block_end: int = matches[i + 1].start() if i + 1 < len(matches) else len(chat_bytes)
+        if _COLON_PATTERN.search(chat_bytes, match.end(), block_end) is None:
+            continue
+        fields: tuple[str, str, str] | None = _split_message_block(
+            match.group(1).decode("utf-8"), str(chat_bytes[match.end():block_end], "utf-8")
+        )
+        if fields is not None:
+            yield fields
+
+
+def _split_message_block(timestamp_str: str, message_block: str) -> tuple[str, str, str] | None:
+    # Split user name from message, if no separator found skip (system message)
+    message_block = message_block.strip()
+    if ':' not in message_block:
+        return None
+
+    user: str
+    message: str
+    user, message = message_block.split(':', 1)
+    user = user.strip()
+    message = message.strip()
+
+    # Clean system messages such as <Media ommitted> and skip empty messages
+    message = re.sub(r'<[^>]+>', '', message)
+    if not message:
+        return None
+
+    # Line breaks are read untranslated, normalize Windows and old Mac ones
+    if '\r' in message:
+        message = message.replace('\r\n', '\n').replace('\r', '\n')
+
+    # Some locales separate the AM/PM marker with a narrow no-break space
+    if '\u202f' in timestamp_str:
+        timestamp_str = timestamp_str.replace('\u202f', ' ')
+    return timestamp_str, user, message
+
+
+def split_segment_columns(chat_text: str | bytes | memoryview) -> tuple[list[str], list[str], list[str]]:
+    """
+    Split a piece of chat text like `split_segment` does, gathering the fields into columns.
+
+    Args:
+        chat_text (str | bytes | memoryview): Chat text, ideally starting at a timestamp.
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: Unparsed timestamps, users and messages.
+    """
+    timestamp_strs: list[str] = []
+    users: list[str] = []
+    messages: list[str] = []
+    for timestamp_str, user, message in split_segment(chat_text):
+        timestamp_strs.append(timestamp_str)
+        users.append(user)
+        messages.append(message)
+    return timestamp_strs, users, messages
+
+
+def parse_segment_columns(chat_text: str | bytes | memoryview,
+                          timestamp_format: str | None) -> tuple[list[str], list[str], list[str]] | Batch:
+    """
+    Split a piece of chat text into message columns, and parse them into a packed batch if the timestamp format is
+    known. This is the work sent to parser worker processes, so that only packed arrays come back.
+
+    Args:
+        chat_text (str | bytes | memoryview): Chat text, ideally starting at a timestamp.
+        timestamp_format (str | None): The export's settled timestamp format, or None to only split the text.
+
+    Returns:
+        tuple[list[str], list[str], list[str]] | Batch: Unparsed timestamps, users and messages, or their packed
+            batch if `timestamp_format` is given.
+    """
+    columns: tuple[list[str], list[str], list[str]] = split_segment_columns(chat_text)
+    return columns if timestamp_format is None else parse_columns(*columns, timestamp_format)
+
+
+def parse_columns(timestamp_strs: list[str], users: list[str], messages: list[str], timestamp_format: str) -> Batch:
+    """
+    Parse the raw message columns of a segment into a packed batch, skipping messages with unparseable timestamps.
+
+    Args:
+        timestamp_strs (list[str]): Unparsed timestamps.
+        users (list[str]): Users.
+        messages (list[str]): Messages.
+        timestamp_format (str): The export's timestamp format.
+
+    Returns:
+        Batch: Message timestamps, users and messages, packed with `pack_batch`.
+    """
+    if not timestamp_strs:
+        return pack_batch(np.array([], dtype="datetime64[ns]"), [], [])
+    timestamps: pd.DatetimeIndex = parse_timestamps(timestamp_strs, timestamp_format)
+    valid: np.ndarray = timestamps.notna()
+    if not valid.all():
+        users = [user for user, keep in zip(users, valid) if keep]
+        messages = [message for message, keep in zip(messages, valid) if keep]
+    return pack_batch(timestamps[valid].values, users, messages)
+
+
+def pack_batch(times: np.ndarray, users: list[str], messages: list[str]) -> Batch:
+    """
+    Pack a batch of parsed messages into arrays, so that only one batch of Python strings is alive at once.
+
+    Args:
+        times (np.ndarray): Message timestamps.
+        users (list[str]): Users.
+        messages (list[str]): Messages.
+
+    Returns:
+        Batch: Message timestamps as datetime64[ns], users as a categorical and messages as an Arrow array.
+    """
+    return (np.asarray(times, dtype="datetime64[ns]"), pd.Categorical(users),
+            pa.array(messages, type=pa.large_string()))
+
+
+def _segment_worker(connection: Connection) -> None:
+    """
+    Worker process loop, splitting and parsing the segments received through a connection in order.
+
+    Each request is a (segment, timestamp_format) tuple, answered with the result of `parse_segment_columns`. A
+    failing segment sends its exception in place of the result.
+    """
+    while True:
+        segment, timestamp_format = connection.recv()
+        try:
+            result: tuple | Exception = parse_segment_columns(segment, timestamp_format)
+        except Exception as e:
+            result = e
+        connection.send(result)
+
+
+def _receive_columns(connection: Connection) -> tuple[list[str], list[str], list[str]] | Batch:
+    # Wait for the next segment of a worker process, raising its errors here
+    try:
+        result: tuple | Exception = connection.recv()
+    except (EOFError, OSError) as e:
+        raise RuntimeError("a parser worker stopped unexpectedly") from e
+    if isinstance(result, Exception):
+        raise result
+    return result
+
 
-        self.users = list(sorted(users))
+if __name__ == "__main__":
+    # Worker process: split and parse segments until the app disconnects
+    serve(_segment_worker)
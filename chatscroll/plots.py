@@ -1,14 +1,73 @@
-from collections import Counter
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
 
-import emoji
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from matplotlib import pyplot as plt
+import plotly.io as pio
 
-from sklearn.feature_extraction.text import CountVectorizer
 from wordcloud import WordCloud
 
+from chatscroll.stats import lttb
+
+# Points per time series sent to the browser, longer series are downsampled
+MAX_POINTS: int = 2000
+
+
+class FigureCache:
+    """
+    In-memory store of serialized Plotly figures with least recently used eviction.
+
+    Figures are kept as JSON, which bounds memory by the total serialized size and hands out a fresh figure on every
+    hit, so callers can't alter cached ones. Keys should identify the chat (e.g. its cache key), the kind of plot and
+    every filter parameter the figure depends on. The cache is thread-safe, so a single instance can be shared by all
+    pages and sessions.
+    """
+    def __init__(self, max_bytes: int) -> None:
+        """
+        Args:
+            max_bytes (int): Memory budget for all serialized figures together, in bytes.
+        """
+        self.max_bytes: int = max_bytes
+        self.nbytes: int = 0
+        self._figures: OrderedDict[Hashable, str] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._figures)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], go.Figure]) -> go.Figure:
+        """
+        Return the figure cached under a key, building and caching it on a miss.
+
+        Args:
+            key (Hashable): Figure key, such as `(chat_key, "msg_over_days", user, start_date, end_date)`.
+            build (Callable[[], go.Figure]): Function building the figure, only called on a miss.
+
+        Returns:
+            go.Figure: The figure.
+        """
+        with self._lock:
+            spec: str | None = self._figures.get(key)
+            if spec is not None:
+                self._figures.move_to_end(key)
+        if spec is not None:
+            return pio.from_json(spec)
+
+        fig: go.Figure = build()
+        spec = fig.to_json()
+        with self._lock:
+            if key not in self._figures and len(spec) <= self.max_bytes:
+                self._figures[key] = spec
+                self.nbytes += len(spec)
+                # Drop least recently used figures until the cache fits its budget
+                while self.nbytes > self.max_bytes:
+                    self.nbytes -= len(self._figures.popitem(last=False)[1])
+        return fig
+
 
 def plot_user_msg_stats(df):
     """
@@ -16,17 +75,20 @@ def plot_user_msg_stats(df):
     The three different traces of the plot are toggleable with a dropdown menu.
 
     Args:
-        df (DataFrame): A chat DataFrame with precomputed `word_count` and `char_count` columns.
+        df (DataFrame): A rollup DataFrame with `user`, `msg`, `words` and `chars` columns, like the one built by
+            `chatscroll.stats.build_rollup`.
 
     Returns:
         go.Figure: A Plotly figure.
     """
-    # Group by user message count and word/character averages
-    user_talk_stats = df.groupby('user').agg(
-        message_count=('message', 'count'),
-        avg_words=('word_count', 'mean'),
-        avg_chars=('char_count', 'mean')
+    # Sum user message, word and character counts, then average words/characters per message
+    user_talk_stats = df.groupby('user', observed=True).agg(
+        message_count=('msg', 'sum'),
+        words=('words', 'sum'),
+        chars=('chars', 'sum')
     ).reset_index()
+    user_talk_stats["avg_words"] = user_talk_stats["words"] / user_talk_stats["message_count"]
+    user_talk_stats["avg_chars"] = user_talk_stats["chars"] / user_talk_stats["message_count"]
 
     # Init plot and add traces
     fig = go.Figure()
@@ -84,15 +146,16 @@ def plot_msg_over_time(df):
     The three different traces of the plot are toggleable with a dropdown menu.
 
     Args:
-        df (DataFrame): A chat DataFrame with precomputed `year`, `year_month` and `weekday` period columns.
+        df (DataFrame): A rollup DataFrame with `msg` counts and `year`, `year_month` and `weekday` period columns,
+            like the one built by `chatscroll.stats.build_rollup`.
 
     Returns:
         go.Figure: A Plotly figure.
     """
-    # Group counts by time period
-    by_year = df.groupby("year").agg(msg=("message", "count")).reset_index()
-    by_month = df.groupby("year_month").agg(msg=("message", "count")).reset_index()
-    by_weekday = df.groupby("weekday").agg(msg=("message", "count")).reset_index()
+    # Sum counts by time period
+    by_year = df.groupby("year").agg(msg=("msg", "sum")).reset_index()
+    by_month = df.groupby("year_month").agg(msg=("msg", "sum")).reset_index()
+    by_weekday = df.groupby("weekday", observed=True).agg(msg=("msg", "sum")).reset_index()
 
     # Weekday ordering to prevent auto alphabetical
     weekday_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
@@ -147,21 +210,32 @@ def plot_msg_over_time(df):
     return fig
 
 
-def plot_msg_over_days(df):
+def plot_msg_over_days(df, max_points: int = MAX_POINTS):
     """
     Simple Plotly Express plot that tracks message frequency at the day level.
     Includes a range slider for more trackable and accurate zooming.
 
+    Long series are downsampled to `max_points` days with largest-triangle-three-buckets, which keeps the peaks, and
+    drawn with WebGL. Filtering the underlying rollup to a shorter date range brings back the full detail.
+
     Args:
         df (DataFrame): A chat DataFrame grouped by precomputed `date` column.
+        max_points (int): Maximum number of days sent to the browser.
 
     Returns:
         go.Figure: A Plotly figure.
     """
+    title = 'Messages per day'
+    downsampled = len(df) > max_points
+    if downsampled:
+        title += f' <sup>(showing {max_points} of {len(df)} days)</sup>'
+        df = df.iloc[lttb(df['date'].to_numpy(), df['msg'].to_numpy(), max_points)]
+
     fig = px.line(
         df, x='date', y='msg',
-        title='Messages per day',
-        labels={'date': 'Date', 'msg': 'Messages'}
+        title=title,
+        labels={'date': 'Date', 'msg': 'Messages'},
+        render_mode='webgl' if downsampled else 'svg'
     )
     fig.update_layout(xaxis_rangeslider_visible=True)
 
@@ -186,20 +260,20 @@ def plot_msg_over_hours(df):
     ]
 
     # Add degrees for each hour for polar plot, 15º per hour
-    # And custom hover labels
-    df["theta"] = df["hour"] * 15
-    df["hover_text"] = [f"Hour: {label}<br>Messages: {msg}" for label, msg in zip(hour_labels, df["msg"])]
+    # And custom hover labels (kept out of the input frame, which may be shared)
+    theta = df["hour"] * 15
+    hover_text = [f"Hour: {label}<br>Messages: {msg}" for label, msg in zip(hour_labels, df["msg"])]
 
     # Init plot and trace
     fig = go.Figure()
     fig.add_trace(go.Barpolar(
         r=df['msg'],
-        theta=df['theta'],
+        theta=theta,
         width=[15] * 24,
         marker_color=df['msg'],
         marker_colorscale='Plasma',
         opacity=0.85,
-        text=df["hover_text"],
+        text=hover_text,
         hoverinfo="text"
     ))
 
@@ -211,7 +285,7 @@ def plot_msg_over_hours(df):
                 direction="clockwise",
                 rotation=90,
                 tickmode='array',
-                tickvals=df["theta"],
+                tickvals=theta,
                 ticktext=hour_labels,
                 tickfont=dict(size=10)
             ),
@@ -228,81 +302,89 @@ def plot_msg_over_hours(df):
     return fig
 
 
-def get_word_frequencies(df, stopwords):
-    """
-    Calculate word frequencies from a message column in a DataFrame.
-
-    Applies a `CountVectorizer` to the `message` column of the input DataFrame,
-    filters out the provided stopwords, and returns a list of words with their
-    corresponding frequencies in descending order.
+# Wordcloud canvas sizes, in pixels
+_WORDCLOUD_SIZE: tuple[int, int] = (800, 400)
+_WORDCLOUD_PREVIEW_SIZE: tuple[int, int] = (400, 200)
 
-    Args:
-        df (DataFrame): A chat Dataframe.
-        stopwords (Any): A collection of words to exclude from counting.
-            Passed as the `stop_words` argument to `CountVectorizer`, which
-            can be either `None`, `"english"` or a `List`.
 
-    Returns:
-        List[Tuple[str, int]]: A list of (word, frequency) tuples sorted by frequency.
-                               Returns an empty list if vectorization fails.
-    """
-    # Initialize the vectorizer and feed message corpus
-    try:
-        vectorizer = CountVectorizer(lowercase=True, stop_words=stopwords)
-        corpus = vectorizer.fit_transform(df["message"])
-
-        # Obtain word counts array and then word frequencies in descending order
-        word_counts = corpus.sum(axis=0).A1
-        word_freq_sorted = sorted(
-            list(zip(vectorizer.get_feature_names_out(), word_counts)),
-            key=lambda x: x[1],
-            reverse=True
-        )
-
-        # Return entire list (can be filtered later)
-        return word_freq_sorted
-    except ValueError:
-        return []
-
-
-def plot_wordcloud(frequencies: dict[str, int]):
+def render_wordcloud(frequencies: dict[str, int], width: int = 800, height: int = 400, colormap: str = "tab10"):
     """
     Uses the WordCloud library to create a visualization from a dictionary of word-frequency pairs.
-    The result is rendered using matplotlib.
+    The result is rendered straight to an image, without going through matplotlib.
 
     Args:
         frequencies (dict[str, int]): A dictionary where keys are words and values are their frequencies.
+        width (int): Image width, in pixels.
+        height (int): Image height, in pixels.
+        colormap (str): Matplotlib colormap used to color words.
 
     Returns:
-        plt.Figure: The matplotlib.pyplot figure containing the word cloud.
+        PIL.Image.Image: The word cloud image.
     """
-    # Generate WordCloud
-    wc = WordCloud(width=800, height=400, background_color='white', colormap='tab10').generate_from_frequencies(
-        frequencies
-    )
-
-    # Display with matplotlib
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.imshow(wc, interpolation='bilinear')
-    ax.axis('off')
+    wc = WordCloud(width=width, height=height, background_color='white', colormap=colormap)
+    return wc.generate_from_frequencies(frequencies).to_image()
 
-    return fig
 
-
-def get_emoji_frequencies(df):
+class WordcloudRenderer:
     """
-    Count emoji frequencies in a chat DataFrame's messages.
-
-    Iterates over each message, extracts characters that are valid emojis using
-    the emoji.EMOJI_DATA dictionary, and returns a frequency count.
+    Renders wordclouds in a pool of background threads, caching the resulting images.
 
-    Args:
-        df (DataFrame): A chat DataFrame.
-
-    Returns:
-        Counter: A collections Counter mapping each emoji character to its frequency.
+    Images are keyed by the words and frequencies they show, their size and colormap, so scrubbing back to an
+    already seen word count shows its image right away. Renders of the same image are started only once, and the
+    most recently used images are kept up to `max_images`. Renders requested for the same slot (e.g. a widget of a
+    session) supersede each other, so that scrubbing through word counts doesn't queue up images nobody will see.
+    A single instance can be shared by all pages and sessions.
     """
-    return Counter(sum(df["message"].apply(lambda text: [c for c in text if c in emoji.EMOJI_DATA]), []))
+    def __init__(self, max_workers: int = 2, max_images: int = 32) -> None:
+        """
+        Args:
+            max_workers (int): Number of threads rendering wordclouds.
+            max_images (int): Number of rendered images kept.
+        """
+        self.max_images: int = max_images
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix="wordcloud")
+        self._images: OrderedDict[str, Future] = OrderedDict()
+        self._slots: dict[tuple[Hashable, bool], Future] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def render(self, frequencies: list[tuple[str, int]], preview: bool = False, colormap: str = "tab10",
+               slot: Hashable | None = None) -> Future:
+        """
+        Start rendering a wordcloud, unless it is already rendered or being rendered.
+
+        Args:
+            frequencies (list[tuple[str, int]]): (word, frequency) tuples to show.
+            preview (bool): Render a smaller, faster to lay out image.
+            colormap (str): Matplotlib colormap used to color words.
+            slot (Hashable | None): Where the image is shown. The previous render of the slot (and preview flag) is
+                cancelled if it hasn't started yet.
+
+        Returns:
+            Future: A future resolving to the wordcloud image. Already done on cache hits, and cancelled if
+                superseded in every slot it was rendered for.
+        """
+        width, height = _WORDCLOUD_PREVIEW_SIZE if preview else _WORDCLOUD_SIZE
+        key: str = hashlib.sha256(repr((frequencies, width, height, colormap)).encode()).hexdigest()
+        with self._lock:
+            future: Future | None = self._images.get(key)
+            if future is not None and not future.cancelled() and not (future.done() and future.exception()):
+                self._images.move_to_end(key)
+            else:
+                future = self._executor.submit(render_wordcloud, dict(frequencies), width, height, colormap)
+                self._images[key] = future
+                # Forget least recently used images past the limit, renders still in flight are kept until done
+                excess: int = len(self._images) - self.max_images
+                for old_key in [k for k, f in self._images.items() if f.done()][:max(excess, 0)]:
+                    del self._images[old_key]
+
+            if slot is not None:
+                superseded: Future | None = self._slots.get((slot, preview))
+                if superseded is not None and superseded is not future:
+                    superseded.cancel()
+                self._slots[(slot, preview)] = future
+                self._slots = {slot_key: f for slot_key, f in self._slots.items() if not f.done()}
+        return future
 
 
 def plot_top_n_emojis(frequencies: Counter, n: int):
@@ -1,15 +1,24 @@
 import hashlib
+import json
 import os
 from abc import ABC, abstractmethod
 
+import numpy as np
+import pyarrow as pa
 import streamlit as st
 import torch
 from langchain.schema import Document
-from langchain_community.retrievers import BM25Retriever
 from langchain_ollama import ChatOllama
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
+from chatscroll.cache import EmbeddingCache, hash_chat
+from chatscroll.search import BM25, term_columns
+from chatscroll.stats import TermMatrix
+
+# Version of the `tokenize` function, part of the BM25 index cache keys. Bump it on any tokenization change
+TOKENIZER_VERSION = 1
+
 
 @st.cache_resource
 def get_llm(model_name, temperature):
@@ -20,6 +29,11 @@ def get_llm(model_name, temperature):
     )
 
 
+def tokenize(text):
+    # BM25 terms, whitespace separated words like LangChain's BM25Retriever
+    return text.split()
+
+
 class ChatSplitter:
     def __init__(self, chunk_size, chunk_overlap, max_message_length):
         self.chunk_size = chunk_size
@@ -53,15 +67,30 @@ class ChatSplitter:
 
 
 class Retriever(ABC):
-    def __init__(self, passages, k, splitter_config):
+    def __init__(self, passages, k, splitter_config, chat_key=None):
         self.passages = passages
         self.k = k
-        self.chunks = None
-        self._split_passages(splitter_config)
+        self.splitter_config = splitter_config
+        self.chat_key = chat_key
+        self._chunks = None
+
+    @property
+    def chunks(self):
+        # Split passages on first use only, indexes loaded from disk don't need them
+        if self._chunks is None:
+            self._chunks = self._split_passages(self.splitter_config)
+        return self._chunks
 
     def _split_passages(self, config):
         # Call external splitter class with default parameters
-        self.chunks = ChatSplitter(**config.model_dump()).split_messages(self.passages)
+        return ChatSplitter(**config.model_dump()).split_messages(self.passages)
+
+    def _get_index_key(self, *params):
+        # Any change to the chat, its chunks or the index params makes a new index. Chats without a known cache key
+        # are hashed from their contents
+        chat_hash = self.chat_key if self.chat_key is not None else hash_chat(self.passages)
+        key = json.dumps([*params, chat_hash, self.splitter_config.model_dump()], sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
 
     @abstractmethod
     def retrieve(self, query):
@@ -71,21 +100,54 @@ class Retriever(ABC):
 
 
 class SimpleRetriever(Retriever):
-    def __init__(self, passages, k, splitter_config):
-        super().__init__(passages, k, splitter_config)
-        self.retriever = BM25Retriever.from_documents(documents=self.chunks)
+    def __init__(self, passages, k, splitter_config, index_cache=None, chat_key=None):
+        super().__init__(passages, k, splitter_config, chat_key)
+
+        # Open the index of this chat, splitter config and tokenization if cached, otherwise build it and cache it
+        key = self._get_index_key("bm25", TOKENIZER_VERSION) if index_cache is not None else None
+        entry = index_cache.get(key) if key is not None else None
+        if entry is not None:
+            self._load_index(entry)
+        else:
+            self._build_index()
+            if key is not None:
+                index_cache.put(key, self._save_index)
+
+    def _build_index(self):
+        # Index chunks as a sparse chunk x term matrix, split on whitespace like LangChain's BM25Retriever
+        texts = [chunk.page_content for chunk in self.chunks]
+        terms = TermMatrix(texts, analyzer=tokenize)
+        self.bm25 = BM25(terms.counts)
+        self.terms = pa.array(terms.terms, type=pa.string())
+        self.texts = pa.array(texts, type=pa.large_string())
+
+    def _save_index(self, path):
+        self.bm25.save(path)
+        for name, strings in [("terms", self.terms), ("texts", self.texts)]:
+            with pa.OSFile(os.path.join(path, f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, pa.schema([(name, strings.type)])) as writer:
+                    writer.write_table(pa.table({name: strings}))
+
+    def _load_index(self, path):
+        # Everything is memory-mapped, so sessions on the same chat share the pages of one index
+        self.bm25 = BM25.load(path)
+        self.terms, self.texts = (self._load_strings(path, name) for name in ["terms", "texts"])
+
+    @staticmethod
+    def _load_strings(path, name):
+        # Files hold a single batch, whose arrays point into the mapped file. Combining chunks would copy them
+        strings = pa.ipc.open_file(pa.memory_map(os.path.join(path, f"{name}.arrow"))).read_all()[name]
+        return strings.chunk(0) if strings.num_chunks == 1 else strings.combine_chunks()
 
     def retrieve(self, query):
-        docs = self.retriever.invoke(query)[:self.k]
-        return "\n\n".join(doc.page_content for doc in docs)
+        # Score only the chunks containing query words, and keep the k best
+        rows, _ = self.bm25.top_k(term_columns(self.terms, tokenize(query)), self.k)
+        return "\n\n".join(self.texts.take(rows).to_pylist())
 
 
 class FAISSRetriever(Retriever):
-    def __init__(
-            self, passages, k, splitter_config, embeddings_model,
-            base_index_dir="./.index_cache"
-        ):
-        super().__init__(passages, k, splitter_config)
+    def __init__(self, passages, k, splitter_config, embeddings_model, index_cache=None, chat_key=None):
+        super().__init__(passages, k, splitter_config, chat_key)
 
         device = "cuda" if torch.cuda.is_available() else "cpu"
         self.embeddings = HuggingFaceEmbeddings(
@@ -95,23 +157,33 @@ class FAISSRetriever(Retriever):
             model_kwargs={'device': device},
             encode_kwargs={"batch_size": 32}
         )
-        if not os.path.exists(base_index_dir):
-            os.makedirs(base_index_dir)
-
-        # Getting the vector store
-        index_path = self._get_index_path(base_index_dir)
-        if os.path.exists(index_path):
-            # Load existing index from disk
-            self.vector_store = FAISS.load_local(index_path, self.embeddings, allow_dangerous_deserialization=True)
-        else:
-            # Build index from scratch
-            self.vector_store = FAISS.from_documents(self.chunks, self.embeddings)
-            self.vector_store.save_local(index_path)
 
-    def _get_index_path(self, base_dir):
-        text = str(self.passages)
-        content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
-        return os.path.join(base_dir, f"faiss_index_{content_hash}")
+        # Load the index of this chat, splitter config and embeddings model if cached, otherwise build it and cache it
+        key = self._get_index_key("faiss", embeddings_model) if index_cache is not None else None
+        entry = index_cache.get(key) if key is not None else None
+        if entry is not None:
+            self.vector_store = FAISS.load_local(entry, self.embeddings, allow_dangerous_deserialization=True)
+        elif index_cache is None:
+            self.vector_store = FAISS.from_documents(self.chunks, self.embeddings)
+        else:
+            self.vector_store = self._build_vector_store(EmbeddingCache(index_cache, embeddings_model))
+            index_cache.put(key, self.vector_store.save_local)
+
+    def _build_vector_store(self, embedding_cache):
+        # Only embed chunks without cached vectors, e.g. the new tail of a re-exported chat
+        texts = [chunk.page_content for chunk in self.chunks]
+        keys = embedding_cache.hash_texts(texts)
+        found, cached = embedding_cache.get(keys)
+        missing = np.flatnonzero(~found)
+        vectors = cached
+        if len(missing):
+            embedded = np.asarray(self.embeddings.embed_documents([texts[i] for i in missing]), dtype=np.float32)
+            embedding_cache.put(keys[missing], embedded)
+            vectors = np.empty((len(texts), embedded.shape[1]), dtype=np.float32)
+            vectors[missing] = embedded
+            if found.any():
+                vectors[found] = cached
+        return FAISS.from_embeddings(zip(texts, vectors), self.embeddings)
 
     def retrieve(self, query):
         docs = self.vector_store.similarity_search(query, k=self.k)
@@ -0,0 +1,192 @@
+import re
+import time
+from collections.abc import Iterator
+from multiprocessing.connection import Connection
+
+import numpy as np
+import pyarrow as pa
+
+from chatscroll.workers import WorkerProcess, serve
+
+
+class QueryTooExpensive(Exception):
+    """
+    Raised when a regex query runs out of its time budget.
+    """
+
+
+def _regex_worker(messages: pa.Array, connection: Connection) -> None:
+    """
+    Worker process loop, matching messages against the regex requests received through a connection.
+
+    Each request is a (job, query, rows, chunk_size) tuple. Matches are sent back one chunk of rows at a time as
+    (job, matches, done) tuples. Any message received while a job is running (a new request, or None) cancels it.
+    A job failing sends its exception in place of the matches, and the worker goes on with the next requests.
+    """
+    while True:
+        request: tuple | None = connection.recv()
+        if request is None:
+            continue
+        job, query, rows, chunk_size = request
+        try:
+            pattern: re.Pattern = re.compile(query, re.IGNORECASE)
+            for start in range(0, len(rows), chunk_size):
+                if connection.poll():
+                    connection.send((job, rows[:0], True))
+                    break
+                chunk: np.ndarray = rows[start:start + chunk_size]
+                found: list[bool] = [message is not None and pattern.search(message) is not None
+                                     for message in messages.take(chunk).to_pylist()]
+                connection.send((job, chunk[np.array(found, dtype=bool)], start + chunk_size >= len(rows)))
+            else:
+                if len(rows) == 0:
+                    connection.send((job, rows, True))
+        except (EOFError, OSError):
+            raise  # The app is gone
+        except Exception as e:
+            connection.send((job, e, True))
+
+
+class RegexSandbox:
+    """
+    Runs regex searches over a chat's messages in a worker process, within a time budget.
+
+    A pattern with catastrophic backtracking can take hours on a single message, and can't be interrupted while
+    matching. Running it in a separate process keeps the app responsive: matches stream back a chunk of messages at
+    a time, newest first, and a search running past its budget or left unfinished is cancelled, stopping the worker
+    process if it doesn't answer. A new worker is then started in the background for the next search.
+
+    Workers run `python -m chatscroll.sandbox` as a `WorkerProcess`, so they never import the Streamlit script.
+    """
+    def __init__(self, messages: pa.Array | pa.ChunkedArray, time_budget: float = 5.0,
+                 chunk_size: int = 16384) -> None:
+        """
+        Args:
+            messages (pa.Array | pa.ChunkedArray): Message contents, in the row order of the chat frame.
+            time_budget (float): Seconds a search may run for.
+            chunk_size (int): Messages matched between partial results.
+        """
+        self.messages: pa.Array = messages.combine_chunks() if isinstance(messages, pa.ChunkedArray) else messages
+        self.time_budget: float = time_budget
+        self.chunk_size: int = chunk_size
+        self._job: int = 0
+        self._running: bool = False
+        self._worker: WorkerProcess | None = None
+        self._connection: Connection | None = None
+        self._start()
+
+    def __del__(self) -> None:
+        self.close()
+
+    def _start(self) -> None:
+        # The worker is connected to on first use, so that it starts meanwhile
+        self._worker = WorkerProcess("chatscroll.sandbox")
+
+    def _connect(self, timeout: float = 30.0) -> Connection:
+        """
+        Connect to the worker process, starting one if needed, and hand it the messages.
+        """
+        if self._connection is not None:
+            return self._connection
+        if self._worker is None:
+            self._start()
+        try:
+            self._connection = self._worker.connect(timeout)
+        except RuntimeError as e:
+            self.close()
+            raise RuntimeError("the regex search worker could not be started") from e
+        try:
+            self._connection.send(self.messages)
+        except OSError as e:
+            self.close()
+            raise RuntimeError("the regex search worker stopped while starting") from e
+        return self._connection
+
+    def close(self) -> None:
+        """
+        Stop the worker process.
+        """
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+        self._connection = None
+        self._running = False
+
+    def restart(self) -> None:
+        """
+        Stop the worker process, even in the middle of a match, and start a new one in the background.
+        """
+        self.close()
+        self._start()
+
+    def cancel(self, grace: float = 0.1) -> None:
+        """
+        Cancel the running search, if any. The worker process is restarted if it doesn't stop within `grace` seconds.
+        """
+        if not self._running:
+            return
+        deadline: float = time.monotonic() + grace
+        try:
+            self._connection.send(None)
+            while (remaining := deadline - time.monotonic()) > 0 and self._connection.poll(remaining):
+                job, _, done = self._connection.recv()
+                if job == self._job and done:
+                    self._running = False
+                    return
+        except (EOFError, OSError):
+            pass  # The worker process died, replace it all the same
+        self.restart()
+
+    def scan(self, query: str, rows: np.ndarray) -> Iterator[np.ndarray]:
+        """
+        Match some messages against a regex query, ignoring case.
+
+        Args:
+            query (str): A valid regular expression.
+            rows (np.ndarray): Sorted positions of the messages to match.
+
+        Yields:
+            np.ndarray: Sorted positions of the matching messages of each chunk, newest chunks first.
+
+        Raises:
+            QueryTooExpensive: If the search runs out of its time budget, after yielding the matches found until then.
+            RuntimeError: If the worker process could not be started or died, a new one is started for the next
+                search.
+            Exception: Any error raised by the search in the worker process, such as `re.error`.
+        """
+        self.cancel()
+        connection: Connection = self._connect()
+
+        self._job += 1
+        deadline: float = time.monotonic() + self.time_budget
+        try:
+            connection.send((self._job, query, np.asarray(rows)[::-1], self.chunk_size))
+            self._running = True
+            while True:
+                remaining: float = deadline - time.monotonic()
+                if remaining <= 0 or not connection.poll(remaining):
+                    # The worker may be stuck in a single message, replace it
+                    self.restart()
+                    raise QueryTooExpensive(f"the query ran for more than {self.time_budget:g} seconds")
+                job, found, done = connection.recv()
+                if job != self._job:
+                    continue  # Leftovers of a cancelled search
+                if isinstance(found, Exception):
+                    self._running = False
+                    raise found
+                yield found[::-1]
+                if done:
+                    self._running = False
+                    return
+        except (EOFError, OSError) as e:
+            # The worker process died, e.g. killed by the system, replace it
+            self.restart()
+            raise RuntimeError("the regex search worker stopped unexpectedly") from e
+        finally:
+            # Searches left unfinished by the caller are cancelled
+            self.cancel()
+
+
+if __name__ == "__main__":
+    # Worker process: receive the messages, then serve searches over them until the app disconnects
+    serve(lambda app_connection: _regex_worker(app_connection.recv(), app_connection))
@@ -0,0 +1,580 @@
+import bisect
+import json
+import os
+import re
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+
+from chatscroll.sandbox import RegexSandbox
+from chatscroll.stats import TermMatrix
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+# Messages lowercased and tokenized into trigrams at a time while building the trigram index
+_TRIGRAM_BLOCK: int = 16384
+
+_WORD_RUN_PATTERN: re.Pattern = re.compile(r"\w+")
+
+
+def required_literals(query: str) -> list[str | list[list]]:
+    """
+    Find literal fragments that every match of a regular expression contains.
+
+    The parsed pattern is walked and its runs of plain characters are collected, looking into groups and into
+    repeats of at least one occurrence. Alternations are kept as a list of the requirements of each branch, one of
+    which must be met. Anything else, such as character classes, optional parts or anchors, just ends a run, so the
+    fragments found are always required, even if not all of them are.
+
+    Args:
+        query (str): A regular expression.
+
+    Returns:
+        list[str | list[list]]: Lowercase literal fragments, and alternatives of further requirements.
+
+    Raises:
+        re.error: If the query is not a valid regular expression.
+    """
+    def walk(parsed) -> Iterator[str | list[list]]:
+        run: list[str] = []
+        for op, av in parsed:
+            if op is sre_parse.LITERAL:
+                run.append(chr(av).lower())
+                continue
+            if run:
+                yield "".join(run)
+                run = []
+            if op is sre_parse.SUBPATTERN:
+                yield from walk(av[-1])
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+                yield from walk(av[2])
+            elif op is sre_parse.BRANCH:
+                yield [list(walk(branch)) for branch in av[1]]
+        if run:
+            yield "".join(run)
+
+    return list(walk(sre_parse.parse(query)))
+
+
+def plain_literal(query: str) -> str | None:
+    """
+    Args:
+        query (str): A regular expression.
+
+    Returns:
+        str | None: The text the query matches if it has no special characters (or only escaped ones), else None.
+
+    Raises:
+        re.error: If the query is not a valid regular expression.
+    """
+    parsed = sre_parse.parse(query)
+    if all(op is sre_parse.LITERAL for op, _ in parsed):
+        return "".join(chr(av) for _, av in parsed)
+    return None
+
+
+def result_page(rows: np.ndarray, page: int, page_size: int) -> np.ndarray:
+    """
+    Select a page of search results, newest first.
+
+    Results are row positions of a time-sorted chat frame, so they are already in time order and a page is just a
+    slice of them from the end, without sorting nor materializing the other results.
+
+    Args:
+        rows (np.ndarray): Sorted positions of the matching messages, such as returned by `SearchIndex.search`.
+        page (int): Page number, starting at 0.
+        page_size (int): Number of results per page.
+
+    Returns:
+        np.ndarray: Positions of the page's messages, newest first.
+    """
+    stop: int = max(len(rows) - page * page_size, 0)
+    return rows[max(stop - page_size, 0):stop][::-1]
+
+
+def page_at(rows: np.ndarray, position: int, page_size: int) -> int:
+    """
+    Find the page of search results, newest first, where results before a message start.
+
+    Args:
+        rows (np.ndarray): Sorted positions of the matching messages.
+        position (int): Position of a message of the time-sorted chat frame.
+        page_size (int): Number of results per page.
+
+    Returns:
+        int: Page number of the newest result before the message, or the last page if there is none.
+    """
+    newer: int = len(rows) - int(np.searchsorted(rows, position))
+    return min(newer, max(len(rows) - 1, 0)) // page_size
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # Unique values of a sorted array, cheaper than `np.unique` on the large arrays of trigram indexing
+    first: np.ndarray = np.ones(len(values), dtype=bool)
+    first[1:] = values[1:] != values[:-1]
+    return values[first]
+
+
+def within(positions: np.ndarray, rows: slice | np.ndarray) -> slice | np.ndarray:
+    """
+    Select the sorted positions that fall within some rows, by binary search.
+
+    Args:
+        positions (np.ndarray): Sorted row positions, such as search results or postings.
+        rows (slice | np.ndarray): A slice of rows, or sorted row positions, such as the date range or user filters
+            of a `ChatIndex`.
+
+    Returns:
+        slice | np.ndarray: A slice or boolean mask of `positions`.
+    """
+    if isinstance(rows, slice):
+        return slice(np.searchsorted(positions, rows.start or 0),
+                     np.searchsorted(positions, rows.stop) if rows.stop is not None else len(positions))
+    if len(rows) == 0:
+        return np.zeros(len(positions), dtype=bool)
+    found: np.ndarray = np.minimum(np.searchsorted(rows, positions), len(rows) - 1)
+    return rows[found] == positions
+
+
+def term_columns(vocabulary: np.ndarray | pa.StringArray, words: list[str]) -> np.ndarray:
+    """
+    Look up words in a sorted vocabulary, such as the terms of a `TermMatrix`.
+
+    Args:
+        vocabulary (np.ndarray | pa.StringArray): Sorted terms. Arrow vocabularies, such as memory-mapped ones, are
+            binary searched in place rather than loaded.
+        words (list[str]): Words to look up, unknown ones are left out.
+
+    Returns:
+        np.ndarray: Column of each known word, in query order and with repeats.
+    """
+    if not words:
+        return np.zeros(0, dtype=np.int64)
+    if isinstance(vocabulary, pa.Array):
+        found: list[int] = [bisect.bisect_left(vocabulary, word, key=lambda term: term.as_py()) for word in words]
+        return np.array([column for column, word in zip(found, words)
+                         if column < len(vocabulary) and vocabulary[column].as_py() == word], dtype=np.int64)
+    terms: np.ndarray = np.array(words, dtype=object)
+    columns: np.ndarray = np.searchsorted(vocabulary, terms)
+    known: np.ndarray = columns < len(vocabulary)
+    known[known] = vocabulary[columns[known]] == terms[known]
+    return columns[known]
+
+
+class BM25:
+    """
+    Okapi BM25 scores over a sparse document × term count matrix, as computed by `rank_bm25.BM25Okapi`.
+
+    Like `BM25Okapi`, idf is `log(N - n + 0.5) - log(n + 0.5)` for a term in `n` of `N` documents, floored at
+    `epsilon` times the average idf for terms in more than half the documents. Queries are scored from the postings
+    of their terms only, so documents without any query term are never scored.
+    """
+    def __init__(self, counts: sp.spmatrix, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25) -> None:
+        """
+        Args:
+            counts (sp.spmatrix): Count of each term (columns) in each document (rows).
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization.
+            epsilon (float): Floor of the idf of common terms, as a fraction of the average idf.
+        """
+        self.k1: float = k1
+        self.postings: sp.csc_matrix = sp.csc_matrix(counts, dtype=np.float64)
+        self.postings.sort_indices()
+        n_docs: int = self.postings.shape[0]
+
+        # Terms without any document are not part of a BM25Okapi vocabulary, leave them out of the average
+        doc_freqs: np.ndarray = np.diff(self.postings.indptr)
+        self.idf: np.ndarray = np.log(n_docs - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if (doc_freqs > 0).any():
+            self.idf[self.idf < 0] = epsilon * self.idf[doc_freqs > 0].mean()
+
+        # Length normalization of each document, the part of the denominator that doesn't depend on the query
+        doc_lengths: np.ndarray = np.asarray(self.postings.sum(axis=1)).ravel()
+        avg_length: float = doc_lengths.mean() if n_docs and doc_lengths.any() else 1.0
+        self.norms: np.ndarray = k1 * (1 - b + b * doc_lengths / avg_length)
+
+    def save(self, path: str) -> None:
+        """
+        Write the index into a directory, as `.npy` arrays that `load` can memory-map.
+
+        Args:
+            path (str): An existing directory.
+        """
+        np.save(os.path.join(path, "postings_indptr.npy"), self.postings.indptr)
+        np.save(os.path.join(path, "postings_indices.npy"), self.postings.indices)
+        np.save(os.path.join(path, "postings_data.npy"), self.postings.data.astype(np.float32))  # Exact for counts
+        np.save(os.path.join(path, "idf.npy"), self.idf)
+        np.save(os.path.join(path, "norms.npy"), self.norms)
+        with open(os.path.join(path, "bm25.json"), "w") as f:
+            json.dump({"k1": self.k1, "shape": list(self.postings.shape)}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25":
+        """
+        Open an index written by `save`.
+
+        Its arrays are memory-mapped rather than read, so opening is instant and every process using the same index
+        shares its pages.
+
+        Args:
+            path (str): Directory written by `save`.
+
+        Returns:
+            BM25: The index, with read-only arrays.
+        """
+        with open(os.path.join(path, "bm25.json"), "r") as f:
+            params: dict[str, Any] = json.load(f)
+        arrays: dict[str, np.ndarray] = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ["postings_indptr", "postings_indices", "postings_data", "idf", "norms"]
+        }
+        bm25: BM25 = cls.__new__(cls)
+        bm25.k1 = params["k1"]
+        bm25.postings = sp.csc_matrix(
+            (arrays["postings_data"], arrays["postings_indices"], arrays["postings_indptr"]),
+            shape=tuple(params["shape"]), copy=False
+        )
+        bm25.idf, bm25.norms = arrays["idf"], arrays["norms"]
+        return bm25
+
+    def scores(self, terms: np.ndarray, rows: slice | np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score the documents containing any query term.
+
+        Args:
+            terms (np.ndarray): Column of each query term, repeated terms count as many times.
+            rows (slice | np.ndarray | None): Only score documents in a slice of rows or sorted row positions, or
+                all of them if None.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Sorted rows of the scored documents and their scores.
+        """
+        columns, repeats = np.unique(np.asarray(terms, dtype=np.int64), return_counts=True)
+        docs, weights = [], []
+        for column, repeat in zip(columns, repeats):
+            span: slice = slice(self.postings.indptr[column], self.postings.indptr[column + 1])
+            postings, tf = self.postings.indices[span], self.postings.data[span]
+            # Filter postings to the selected rows before scoring them
+            if rows is not None:
+                keep: slice | np.ndarray = within(postings, rows)
+                postings, tf = postings[keep], tf[keep]
+            docs.append(postings)
+            weights.append(repeat * self.idf[column] * tf * (self.k1 + 1) / (tf + self.norms[postings]))
+
+        if not docs:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        docs_found: np.ndarray = np.concatenate(docs)
+        if len(docs_found) > len(self.norms) // 16:
+            # Common terms, sum the weights of every document at once rather than sorting the postings
+            n_docs: int = len(self.norms)
+            scored: np.ndarray = np.flatnonzero(np.bincount(docs_found, minlength=n_docs))
+            return scored, np.bincount(docs_found, weights=np.concatenate(weights), minlength=n_docs)[scored]
+        scored, inverse = np.unique(docs_found, return_inverse=True)
+        return scored.astype(np.int64), np.bincount(inverse, weights=np.concatenate(weights), minlength=len(scored))
+
+    def top_k(self, terms: np.ndarray, k: int,
+              rows: slice | np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the best scored documents for a query.
+
+        Only the top `k` scores are selected (with `np.argpartition`) and sorted, ties favor later documents.
+
+        Args:
+            terms (np.ndarray): Column of each query term, repeated terms count as many times.
+            k (int): Number of documents to return.
+            rows (slice | np.ndarray | None): Only rank documents in a slice of rows or sorted row positions.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Rows of up to `k` documents containing any query term, by descending
+                score, and their scores.
+        """
+        docs, scores = self.scores(terms, rows)
+        if len(docs) > k > 0:
+            # Keep scores above the k-th largest one, and as many tied ones as fit from the latest documents
+            kth: float = np.partition(scores, len(scores) - k)[len(scores) - k]
+            top: np.ndarray = np.concatenate([np.flatnonzero(scores > kth), np.flatnonzero(scores == kth)[::-1]])[:k]
+            docs, scores = docs[top], scores[top]
+        elif k <= 0:
+            docs, scores = docs[:0], scores[:0]
+        order: np.ndarray = np.lexsort((-docs, -scores))
+        return docs[order], scores[order]
+
+
+class SearchIndex:
+    """
+    Per chat index narrowing the messages a case-insensitive regex search has to scan.
+
+    Two indexes are kept over the lowercased messages: an inverted index from words to the messages containing them
+    (the message × term matrix of a `TermMatrix`, by column) and a trigram index from every 3 character sequence to
+    the messages containing it. Queries are narrowed with the literal fragments every match must contain: the words
+    in them through the vocabulary, and the fragments with other characters through their trigrams. The regex then
+    only runs over the candidate messages.
+    """
+    def __init__(self, messages: pd.Series, terms: TermMatrix) -> None:
+        """
+        Args:
+            messages (pd.Series): Message contents, in the row order of the chat frame.
+            terms (TermMatrix): Word counts of the same messages, tokenized by default.
+        """
+        self.messages: pd.Series = messages.reset_index(drop=True)
+        self._arrow: pa.Array | pa.ChunkedArray = pa.array(self.messages.array)
+        self._analyzer: Callable[[str], list[str]] = terms.analyzer
+        self._vocabulary: np.ndarray = terms.terms
+        self._terms: pa.Array = pa.array(terms.terms, type=pa.string())
+        self.bm25: BM25 = BM25(terms.counts)
+        self._postings: sp.csc_matrix = self.bm25.postings
+        self._trigrams, self._trigram_indptr, self._trigram_rows = self._build_trigrams(self.messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    @staticmethod
+    def _build_trigrams(messages: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Build the trigram postings of some messages.
+
+        Trigrams are packed in a single integer (21 bits per code point). Each block of messages is deduplicated on
+        its own, numbering its trigrams and sorting the (trigram, row) pairs packed together with `np.unique`. Blocks
+        are then merged into the postings of every trigram with a counting sort, so the trigram occurrences of the
+        whole chat are never sorted at once.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Sorted packed trigrams, offsets of the rows of each trigram,
+                and the rows themselves, sorted for each trigram.
+        """
+        block_trigrams, block_pairs = [], []
+        for block_start in range(0, len(messages), _TRIGRAM_BLOCK):
+            block: pd.Series = messages.iloc[block_start:block_start + _TRIGRAM_BLOCK]
+            lowered: list[str] = [message.lower() for message in block]
+            lengths: np.ndarray = np.fromiter(map(len, lowered), dtype=np.int64, count=len(lowered))
+            codes: np.ndarray = np.frombuffer("".join(lowered).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+            if len(codes) < 3:
+                continue
+
+            # Pack the trigram starting at every character, then drop the ones running into the next message
+            packed: np.ndarray = (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+            row: np.ndarray = np.repeat(np.arange(block_start, block_start + len(lowered), dtype=np.int64), lengths)
+            ends: np.ndarray = np.repeat(np.cumsum(lengths), lengths)
+            inside: np.ndarray = np.arange(len(codes) - 2) + 2 < ends[:-2]
+
+            # Pairs sort by the block's trigram number first, which follows the trigram order, then by row
+            packed = packed[inside]
+            trigrams: np.ndarray = _sorted_unique(np.sort(packed))
+            pairs: np.ndarray = (np.searchsorted(trigrams, packed).astype(np.int64) << 32) | row[:-2][inside]
+            block_trigrams.append(trigrams)
+            block_pairs.append(_sorted_unique(np.sort(pairs)))
+
+        if not block_trigrams:
+            return np.array([], dtype=np.uint64), np.zeros(1, dtype=np.int64), np.array([], dtype=np.int32)
+        trigrams = _sorted_unique(np.sort(np.concatenate(block_trigrams)))
+        block_columns: list[np.ndarray] = [np.searchsorted(trigrams, block) for block in block_trigrams]
+        counts: np.ndarray = np.zeros(len(trigrams), dtype=np.int64)
+        for columns, pairs in zip(block_columns, block_pairs):
+            counts[columns] += np.bincount(pairs >> 32, minlength=len(columns))
+        indptr: np.ndarray = np.r_[0, np.cumsum(counts)].astype(np.int64)
+
+        # Blocks come in row order, so appending each one's rows after the previous ones keeps postings sorted
+        rows: np.ndarray = np.empty(indptr[-1], dtype=np.int32)
+        filled: np.ndarray = indptr[:-1].copy()
+        for columns, pairs in zip(block_columns, block_pairs):
+            numbers = pairs >> 32
+            block_counts: np.ndarray = np.bincount(numbers, minlength=len(columns))
+            block_offsets: np.ndarray = np.cumsum(block_counts) - block_counts
+            rows[filled[columns][numbers] + np.arange(len(pairs)) - block_offsets[numbers]] = pairs & 0xFFFFFFFF
+            filled[columns] += block_counts
+        return trigrams, indptr, rows
+
+    def _trigram_candidates(self, literal: str) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Sorted rows containing every trigram of a lowercase literal of 3 or more characters.
+        """
+        codes: np.ndarray = np.frombuffer(literal.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        packed: np.ndarray = np.unique((codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:])
+        found: np.ndarray = np.searchsorted(self._trigrams, packed)
+        if (found >= len(self._trigrams)).any() or (self._trigrams[found] != packed).any():
+            return np.array([], dtype=np.int32)
+
+        # Intersect the shortest postings first
+        lengths: np.ndarray = self._trigram_indptr[found + 1] - self._trigram_indptr[found]
+        candidates: np.ndarray | None = None
+        for i in found[np.argsort(lengths)]:
+            postings: np.ndarray = self._trigram_rows[self._trigram_indptr[i]:self._trigram_indptr[i + 1]]
+            candidates = postings if candidates is None else np.intersect1d(candidates, postings, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        return candidates
+
+    def _word_candidates(self, word: str) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Sorted rows with a word containing a lowercase word fragment of 2 or more characters.
+        """
+        # Words are maximal runs of word characters, so the fragment is part of a single word of the vocabulary
+        columns: np.ndarray = np.flatnonzero(pc.match_substring(self._terms, word).to_numpy(zero_copy_only=False))
+        if len(columns) == 1:
+            column: int = int(columns[0])
+            return self._postings.indices[self._postings.indptr[column]:self._postings.indptr[column + 1]]
+        return self._union([self._postings[:, columns].indices])
+
+    def _literal_candidates(self, literal: str) -> np.ndarray | None:
+        """
+        Returns:
+            np.ndarray | None: Sorted rows that may contain a lowercase literal, or None if it is too short to narrow
+                them.
+        """
+        # Words go through the vocabulary, other fragments through trigrams
+        lookups: list[tuple] = [(self._word_candidates, word) for word in _WORD_RUN_PATTERN.findall(literal)
+                                if len(word) >= 2]
+        if len(literal) >= 3 and not _WORD_RUN_PATTERN.fullmatch(literal):
+            lookups.append((self._trigram_candidates, literal))
+        return self._intersect(lookup(fragment) for lookup, fragment in lookups)
+
+    def _narrow(self, requirements: list[str | list[list]]) -> np.ndarray | None:
+        """
+        Returns:
+            np.ndarray | None: Sorted rows meeting some requirements from `required_literals`, or None if they don't
+                narrow the rows.
+        """
+        def rows(requirement: str | list[list]) -> np.ndarray | None:
+            if isinstance(requirement, str):
+                return self._literal_candidates(requirement)
+            # Any branch of an alternation can match, all of them have to narrow the rows
+            branches: list[np.ndarray | None] = []
+            for branch in requirement:
+                branches.append(self._narrow(branch))
+                if branches[-1] is None:
+                    return None
+            return self._union(branches)
+
+        return self._intersect(map(rows, requirements))
+
+    def _union(self, row_sets: list[np.ndarray]) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Sorted union of rows, through a mask over all messages instead of sorting them.
+        """
+        found: np.ndarray = np.zeros(len(self), dtype=bool)
+        for rows in row_sets:
+            found[rows] = True
+        return np.flatnonzero(found)
+
+    @staticmethod
+    def _intersect(row_sets: Iterator[np.ndarray | None]) -> np.ndarray | None:
+        """
+        Returns:
+            np.ndarray | None: Intersection of sorted rows, skipping None ones, or None if all of them are.
+        """
+        candidates: np.ndarray | None = None
+        for rows in row_sets:
+            if rows is not None:
+                candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+                if len(candidates) == 0:
+                    break
+        return candidates
+
+    def candidates(self, query: str) -> np.ndarray | None:
+        """
+        Narrow the messages a regex query can match.
+
+        Args:
+            query (str): A regular expression, matched ignoring case.
+
+        Returns:
+            np.ndarray | None: Sorted positions of the messages that may match, or None if the query has no literal
+                fragment to narrow them with.
+
+        Raises:
+            re.error: If the query is not a valid regular expression.
+        """
+        return self._narrow(required_literals(query))
+
+    def rank(self, query: str, k: int, rows: slice | np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Rank messages by their BM25 score for the words of a query.
+
+        Args:
+            query (str): Keywords, tokenized like the messages.
+            k (int): Number of messages to return.
+            rows (slice | np.ndarray | None): Only rank messages in a slice of rows or sorted row positions, such as
+                the date range or user filters of a `ChatIndex`.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Positions of up to `k` messages with any word of the query, by descending
+                score, and their scores.
+        """
+        return self.bm25.top_k(term_columns(self._vocabulary, self._analyzer(query)), k, rows)
+
+    def stream(self, query: str, rows: slice | np.ndarray | None = None,
+               sandbox: RegexSandbox | None = None) -> Iterator[np.ndarray]:
+        """
+        Find the messages matching a regex query, ignoring case, in chunks.
+
+        Plain words and text are matched at once through the indexes and Arrow. Other regexes only run over the
+        messages containing their literal fragments, in a worker process if a sandbox is given.
+
+        Args:
+            query (str): A regular expression, or a plain keyword or phrase.
+            rows (slice | np.ndarray | None): Only search messages in a slice of rows or sorted row positions.
+            sandbox (RegexSandbox | None): Sandbox running regexes within a time budget, or None to run them here.
+
+        Yields:
+            np.ndarray: Sorted positions of matching messages, newest chunks first.
+
+        Raises:
+            re.error: If the query is not a valid regular expression, before yielding anything.
+            QueryTooExpensive: If the sandboxed regex runs out of its time budget.
+            RuntimeError: If the sandbox worker process could not be started or died.
+        """
+        if len(query) >= 2 and _WORD_RUN_PATTERN.fullmatch(query):
+            # Plain words are found exactly through the vocabulary, without running the regex
+            candidates: np.ndarray = self._word_candidates(query.lower()).astype(np.int64)
+            yield candidates[within(candidates, rows)] if rows is not None else candidates
+            return
+
+        # Patterns the regex parser accepts but can't compile (e.g. variable-width look-behinds) fail here too
+        re.compile(query, re.IGNORECASE)
+        narrowed: np.ndarray | None = self.candidates(query)
+        candidates = np.arange(len(self)) if narrowed is None else narrowed.astype(np.int64)
+        if rows is not None:
+            candidates = candidates[within(candidates, rows)]
+        if len(candidates) == 0:
+            yield candidates
+            return
+
+        literal: str | None = plain_literal(query)
+        if literal is not None:
+            # Plain text is matched with Arrow's substring kernel
+            matches: pa.Array = pc.match_substring(self._arrow.take(candidates), literal, ignore_case=True)
+            yield candidates[matches.to_numpy(zero_copy_only=False)]
+        elif sandbox is not None:
+            yield from sandbox.scan(query, candidates)
+        else:
+            # Python regex flags keep the `re` syntax instead of Arrow's RE2 one
+            found: pd.Series = self.messages.iloc[candidates].str.contains(query, flags=re.IGNORECASE, na=False)
+            yield candidates[found.to_numpy(dtype=bool)]
+
+    def search(self, query: str, rows: slice | np.ndarray | None = None) -> np.ndarray:
+        """
+        Find the messages matching a regex query, ignoring case.
+
+        Args:
+            query (str): A regular expression, or a plain keyword or phrase.
+            rows (slice | np.ndarray | None): Only search messages in a slice of rows or sorted row positions.
+
+        Returns:
+            np.ndarray: Sorted positions of the matching messages.
+
+        Raises:
+            re.error: If the query is not a valid regular expression.
+        """
+        return np.sort(np.concatenate([np.zeros(0, dtype=np.int64), *self.stream(query, rows)]))
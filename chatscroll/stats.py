@@ -0,0 +1,387 @@
+import datetime
+import re
+from collections.abc import Callable, Iterable, Sequence
+
+import emoji
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+
+from chatscroll.parser import ChatData, arrow_chunks
+
+
+# Weekday names in calendar order, as returned by `Series.dt.day_name`
+WEEKDAYS: list[str] = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regex matching any of the given words, longest first, from a trie of their characters.
+
+    Words sharing a prefix share a branch, so matching only tries the characters that can follow what was matched
+    so far, instead of every word of a plain alternation. Continuations are optional groups, which are greedy and
+    therefore prefer the longest word.
+
+    Args:
+        words (Iterable[str]): Non-empty words.
+
+    Returns:
+        str: The regex pattern.
+    """
+    trie: dict[str, dict] = {}
+    for word in words:
+        node: dict[str, dict] = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def to_pattern(node: dict[str, dict]) -> str:
+        # Characters ending a word with no continuation are gathered into a character class
+        leaves: list[str] = []
+        branches: list[str] = []
+        for char, child in sorted(node.items()):
+            if not char:
+                continue
+            if list(child) == [""]:
+                leaves.append(re.escape(char))
+            else:
+                branches.append(re.escape(char) + to_pattern(child))
+        if leaves:
+            branches.append(leaves[0] if len(leaves) == 1 else f"[{''.join(leaves)}]")
+        pattern: str = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return to_pattern(trie)
+
+
+def _emoji_start_pattern(emojis: Iterable[str]) -> str:
+    # Lookahead ruling out most positions with a single character class check, before trying the trie branches.
+    # Emojis starting with common text characters (keycaps such as 1️⃣) must be followed by their second character,
+    # the other first characters are merged into a few wide ranges
+    first_chars: set[int] = set()
+    keycaps: dict[str, set[str]] = {}
+    for word in emojis:
+        if ord(word[0]) < 0x100 and len(word) > 1:
+            keycaps.setdefault(word[0], set()).add(word[1])
+        else:
+            first_chars.add(ord(word[0]))
+
+    ranges: list[list[int]] = []
+    for code in sorted(first_chars):
+        if ranges and code >= 0x100 and code - ranges[-1][1] <= 0x100:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    first_class: str = "".join(
+        re.escape(chr(start)) if start == end else f"{re.escape(chr(start))}-{re.escape(chr(end))}"
+        for start, end in ranges
+    )
+    keycap_starts: list[str] = [
+        f"{re.escape(char)}[{''.join(map(re.escape, sorted(seconds)))}]" for char, seconds in sorted(keycaps.items())
+        if ord(char) not in first_chars
+    ]
+    return "(?=" + "|".join([f"[{first_class}]"] + keycap_starts) + ")"
+
+
+# Every emoji, including skin tone, ZWJ, keycap and flag sequences, matched as a whole
+EMOJI_PATTERN: re.Pattern[str] = re.compile(
+    _emoji_start_pattern(emoji.EMOJI_DATA) + trie_pattern(emoji.EMOJI_DATA)
+)
+
+
+def extract_emojis(text: str) -> list[str]:
+    """
+    Args:
+        text (str): A message.
+
+    Returns:
+        list[str]: Emojis of the message in order, multi-codepoint sequences kept whole.
+    """
+    return EMOJI_PATTERN.findall(text)
+
+
+def build_chat_frame(chat: ChatData) -> pd.DataFrame:
+    """
+    Build the chat DataFrame shared by all dashboard pages, adding the time period and length columns they use.
+
+    All columns are computed with vectorized datetime and Arrow string kernels instead of row-wise functions, so
+    that the frame can be built once per uploaded chat and then reused read-only on every rerun. Rows are sorted by
+    time (exports nearly always are already), so that date ranges are contiguous slices, see `ChatIndex`.
+
+    Args:
+        chat (ChatData): The parsed chat.
+
+    Returns:
+        pd.DataFrame: A time-sorted chat DataFrame with `time`, `user` and `message` columns, plus `date`
+            (midnight of the message day), `year_month`, `year`, `weekday` (ordered categorical), `hour`,
+            `word_count` and `char_count`.
+    """
+    df: pd.DataFrame = chat.to_frame()
+    if not df["time"].is_monotonic_increasing:
+        df = df.sort_values("time", kind="stable", ignore_index=True)
+    df["date"] = df["time"].dt.normalize()
+    df["year_month"] = df["time"].dt.to_period("M")
+    df["year"] = df["time"].dt.year
+    df["weekday"] = pd.Categorical.from_codes(df["time"].dt.weekday, categories=WEEKDAYS, ordered=True)
+    df["hour"] = df["time"].dt.hour
+    df["word_count"] = count_words(df["message"].array)
+    df["char_count"] = count_chars(df["message"].array)
+    return df
+
+
+def count_words(messages: pd.arrays.ArrowStringArray) -> np.ndarray:
+    """
+    Count the whitespace separated words of each message, like `len(message.split())` does.
+
+    Args:
+        messages (pd.arrays.ArrowStringArray): Message contents.
+
+    Returns:
+        np.ndarray: Number of words per message.
+    """
+    # Split one Arrow chunk at a time, so only a chunk's worth of words is materialized at once
+    counts: list[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+    for chunk in arrow_chunks(messages):
+        trimmed: pa.Array = pc.utf8_trim_whitespace(chunk)
+        words: pa.Array = pc.list_value_length(pc.utf8_split_whitespace(trimmed))
+        # Splitting an empty string yields a single empty word
+        counts.append(pc.if_else(pc.equal(pc.utf8_length(trimmed), 0), 0, words).to_numpy(zero_copy_only=False))
+    return np.concatenate(counts)
+
+
+def count_chars(messages: pd.arrays.ArrowStringArray) -> np.ndarray:
+    """
+    Count the characters (code points) of each message, like `len(message)` does.
+
+    Args:
+        messages (pd.arrays.ArrowStringArray): Message contents.
+
+    Returns:
+        np.ndarray: Number of characters per message.
+    """
+    return np.concatenate([np.zeros(0, dtype=np.int64)] + [
+        pc.utf8_length(chunk).to_numpy(zero_copy_only=False) for chunk in arrow_chunks(messages)
+    ])
+
+
+def build_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pre-aggregate a chat into a cube of message counts and word/character sums per user, date and hour.
+
+    Every activity metric and plot (counts per user, date, hour, year, month or weekday, under any date range and
+    user filter) can be answered by filtering and summing the cube, whose size grows with the number of active days
+    and users rather than with the number of messages.
+
+    Args:
+        df (pd.DataFrame): A chat DataFrame from `build_chat_frame`.
+
+    Returns:
+        pd.DataFrame: One row per active (date, user, hour), sorted by date, with `msg`, `words` and `chars` sums
+            and the `year_month`, `year` and `weekday` periods of the date.
+    """
+    rollup: pd.DataFrame = df.groupby(["date", "user", "hour"], observed=True, sort=True).agg(
+        msg=("hour", "size"),
+        words=("word_count", "sum"),
+        chars=("char_count", "sum"),
+    ).reset_index()
+    rollup["year_month"] = rollup["date"].dt.to_period("M")
+    rollup["year"] = rollup["date"].dt.year
+    rollup["weekday"] = pd.Categorical.from_codes(rollup["date"].dt.weekday, categories=WEEKDAYS, ordered=True)
+    return rollup
+
+
+def date_slice(dates: np.ndarray, start: datetime.date, end: datetime.date) -> slice:
+    """
+    Find the rows of a date range by binary search.
+
+    Args:
+        dates (np.ndarray): Sorted datetime64 dates, such as the `date` column of a chat frame or rollup.
+        start (datetime.date): First day of the range.
+        end (datetime.date): Last day of the range, included.
+
+    Returns:
+        slice: Positions of the rows dated within the range.
+    """
+    return slice(
+        int(np.searchsorted(dates, np.datetime64(start, "D"), side="left")),
+        int(np.searchsorted(dates, np.datetime64(end, "D"), side="right")),
+    )
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Downsample a series with the largest-triangle-three-buckets algorithm.
+
+    The first and last points are kept, and the rest are split in `n_out - 2` buckets. From each bucket the point
+    forming the largest triangle with the previously kept point and the average of the next bucket is kept, which
+    preserves peaks and the overall shape far better than taking every nth point.
+
+    Args:
+        x (np.ndarray): Sorted x values, numeric or datetime64.
+        y (np.ndarray): Numeric y values.
+        n_out (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted positions of the kept points, all of them if the series has no more than `n_out` points.
+    """
+    n: int = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    x = (x.astype(np.int64) if x.dtype.kind == "M" else x).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges for the points between the first and last, at least one point per bucket
+    edges: np.ndarray = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept: np.ndarray = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a: int = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i < n_out - 3 else (n - 1, n)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        # Twice the triangle areas, the constant factor doesn't change the largest one
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = int(lo + areas.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+class ChatIndex:
+    """
+    Positional index over a time-sorted chat frame from `build_chat_frame`.
+
+    Date ranges are found by binary search over the sorted dates and users by their sorted row positions, so
+    filters never scan nor compare the whole frame. Date ranges select contiguous rows, which are sliced without
+    copying them.
+    """
+    def __init__(self, df: pd.DataFrame) -> None:
+        """
+        Args:
+            df (pd.DataFrame): A chat frame from `build_chat_frame`, sorted by time.
+        """
+        self.dates: np.ndarray = df["date"].to_numpy()
+
+        # Group row positions by user code with a single stable sort, so each user's rows stay in time order
+        codes: np.ndarray = df["user"].cat.codes.to_numpy()
+        order: np.ndarray = np.argsort(codes, kind="stable")
+        bounds: np.ndarray = np.searchsorted(codes[order], np.arange(len(df["user"].cat.categories) + 1))
+        self.user_positions: dict[str, np.ndarray] = {
+            user: order[bounds[code]:bounds[code + 1]] for code, user in enumerate(df["user"].cat.categories)
+        }
+
+    def date_range(self, start: datetime.date, end: datetime.date) -> slice:
+        """
+        Args:
+            start (datetime.date): First day of the range.
+            end (datetime.date): Last day of the range, included.
+
+        Returns:
+            slice: Rows dated within the range.
+        """
+        return date_slice(self.dates, start, end)
+
+    def user_rows(self, user: str, start: datetime.date, end: datetime.date) -> np.ndarray:
+        """
+        Args:
+            user (str): User name.
+            start (datetime.date): First day of the range.
+            end (datetime.date): Last day of the range, included.
+
+        Returns:
+            np.ndarray: Positions of the user's rows dated within the range, in time order.
+        """
+        positions: np.ndarray = self.user_positions.get(user, np.zeros(0, dtype=np.intp))
+        rows: slice = self.date_range(start, end)
+        return positions[np.searchsorted(positions, rows.start):np.searchsorted(positions, rows.stop)]
+
+
+class TermMatrix:
+    """
+    Sparse message × term counts of a whole chat, tokenized once like `CountVectorizer` does by default (or with
+    another analyzer, such as `extract_emojis`).
+
+    Word frequencies of any subset of messages are then column sums over some of its rows: date ranges are
+    contiguous rows of a time-sorted chat, summed straight from the sparse arrays, and stopwords are a mask over the
+    vocabulary instead of a new tokenization.
+    """
+    def __init__(self, messages: Sequence[str], analyzer: Callable[[str], list[str]] | None = None) -> None:
+        """
+        Args:
+            messages (Sequence[str]): Message contents, in the row order of the chat frame.
+            analyzer (Callable[[str], list[str]] | None): Function extracting the terms of a message. Lowercase
+                words by default.
+        """
+        vectorizer: CountVectorizer = CountVectorizer(lowercase=True, dtype=np.int32, analyzer=analyzer or "word")
+        self.analyzer: Callable[[str], list[str]] = vectorizer.build_analyzer()
+        try:
+            self.counts: sp.csr_matrix = vectorizer.fit_transform(messages).tocsr()
+            self.terms: np.ndarray = vectorizer.get_feature_names_out()
+        except ValueError:
+            # No terms at all, e.g. a chat of emojis only
+            self.counts = sp.csr_matrix((len(messages), 0), dtype=np.int32)
+            self.terms = np.array([], dtype=object)
+
+    def stopword_mask(self, stopwords: str | list[str] | None) -> np.ndarray:
+        """
+        Args:
+            stopwords (str | list[str] | None): `"english"` for the scikit-learn list, a list of lowercase words, or
+                None to keep every term.
+
+        Returns:
+            np.ndarray: Boolean mask of the terms that are not stopwords.
+        """
+        if stopwords is None:
+            return np.ones(len(self.terms), dtype=bool)
+        words: frozenset[str] = ENGLISH_STOP_WORDS if stopwords == "english" else frozenset(stopwords)
+        return ~np.isin(self.terms, list(words))
+
+    def term_counts(self, rows: slice | np.ndarray) -> np.ndarray:
+        """
+        Args:
+            rows (slice | np.ndarray): A slice of rows, or row positions.
+
+        Returns:
+            np.ndarray: Total count of each term over the rows.
+        """
+        if isinstance(rows, slice):
+            # Contiguous rows are a range of the sparse arrays, sum them without slicing the matrix
+            start, stop, _ = rows.indices(self.counts.shape[0])
+            span: slice = slice(self.counts.indptr[start], self.counts.indptr[max(start, stop)])
+            return np.bincount(
+                self.counts.indices[span], weights=self.counts.data[span], minlength=len(self.terms)
+            ).astype(np.int64)
+        return np.asarray(self.counts[rows].sum(axis=0)).ravel().astype(np.int64)
+
+    def word_frequencies(self, rows: slice | np.ndarray, stopwords: str | list[str] | None,
+                         n: int) -> list[tuple[str, int]]:
+        """
+        Find the most frequent words of some messages.
+
+        Only the top `n` terms are selected (with `np.partition`) and sorted, by descending count and then
+        alphabetically, which matches the head of a full sort.
+
+        Args:
+            rows (slice | np.ndarray): A slice of rows, or row positions.
+            stopwords (str | list[str] | None): Words left out, see `stopword_mask`.
+            n (int): Number of words to return.
+
+        Returns:
+            list[tuple[str, int]]: Up to `n` (word, frequency) tuples sorted by frequency. Words not found in the
+                messages are left out.
+        """
+        counts: np.ndarray = self.term_counts(rows)
+        counts[~self.stopword_mask(stopwords)] = 0
+        found: np.ndarray = np.flatnonzero(counts)
+        if len(found) > n > 0:
+            # Keep terms above the n-th largest count, and as many tied ones as fit in alphabetical order
+            kth: int = np.partition(counts[found], len(found) - n)[len(found) - n]
+            above: np.ndarray = found[counts[found] > kth]
+            found = np.concatenate([above, found[counts[found] == kth][:n - len(above)]])
+        elif n <= 0:
+            found = found[:0]
+        top: np.ndarray = found[np.lexsort((found, -counts[found]))]
+        return [(str(term), int(count)) for term, count in zip(self.terms[top], counts[top])]
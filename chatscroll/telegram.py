@@ -0,0 +1,182 @@
+import json
+from collections.abc import Iterator
+from typing import Any, TextIO
+
+import numpy as np
+import pandas as pd
+
+
+# Timestamp format of Telegram JSON exports
+_TELEGRAM_TIMESTAMP_FORMAT: str = '%Y-%m-%dT%H:%M:%S'
+
+# Number of messages converted and yielded at once
+_BATCH_SIZE: int = 10_000
+
+
+class _JSONStream:
+    """
+    Minimal incremental JSON reader over a text stream.
+
+    Keeps a buffer of at most a few blocks plus the value being decoded, so that a huge top-level array can be
+    walked one element at a time instead of loading the whole document.
+    """
+    def __init__(self, chat_file: TextIO, block_size: int) -> None:
+        self.chat_file: TextIO = chat_file
+        self.block_size: int = block_size
+        self.decoder: json.JSONDecoder = json.JSONDecoder()
+        self.buffer: str = ""
+        self.pos: int = 0
+        self.eof: bool = False
+
+    def _fill(self) -> bool:
+        # Drop consumed text and read one more block, returning False at the end of the file
+        if self.eof:
+            return False
+        block: str = self.chat_file.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character without consuming it, or an empty string at the end.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        """
+        Consume the next non-whitespace character, which must be `char`.
+
+        Raises:
+            ValueError: If another character is found.
+        """
+        if self.peek() != char:
+            raise ValueError(f"Malformed Telegram export: expected {char!r} at character {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """
+        Decode the next JSON value, reading more blocks until it is complete.
+
+        A value ending right at the end of the buffer might be a truncated number, so at least one character past
+        it must be available before accepting it.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end < len(self.buffer) or not self._fill():
+                self.pos = end
+                return value
+
+
+def iter_telegram_messages(chat_file: TextIO, block_size: int) -> Iterator[dict[str, Any]]:
+    """
+    Walk the `messages` array of a Telegram `result.json` export one raw message at a time.
+    Other top-level values (chat name, type, id) are decoded and skipped.
+
+    Args:
+        chat_file (TextIO): Text stream over the export.
+        block_size (int): Number of characters read at once.
+
+    Yields:
+        dict[str, Any]: Raw Telegram message objects.
+
+    Raises:
+        ValueError: If the export is not a single chat JSON object with a `messages` array.
+    """
+    stream: _JSONStream = _JSONStream(chat_file, block_size)
+    stream.expect("{")
+    found_messages: bool = False
+    while stream.peek() != "}":
+        key: Any = stream.value()
+        stream.expect(":")
+        if key == "messages":
+            found_messages = True
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield stream.value()
+                if stream.peek() == ",":
+                    stream.expect(",")
+            stream.expect("]")
+        else:
+            stream.value()
+        if stream.peek() == ",":
+            stream.expect(",")
+    stream.expect("}")
+    if not found_messages:
+        raise ValueError("Malformed Telegram export: no messages found")
+
+
+def flatten_text(text: str | list[str | dict[str, Any]]) -> str:
+    """
+    Flatten Telegram rich text into plain text.
+
+    Formatted messages come as lists mixing plain strings and entity objects (links, bold text, mentions...),
+    each holding its visible text under the `text` key.
+
+    Args:
+        text (str | list[str | dict[str, Any]]): The `text` field of a Telegram message.
+
+    Returns:
+        str: The message as plain text.
+    """
+    if isinstance(text, str):
+        return text
+    return "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in text)
+
+
+def iter_telegram_batches(chat_file: TextIO, block_size: int) -> Iterator[tuple[np.ndarray, list[str], list[str]]]:
+    """
+    Parse a Telegram JSON export into batches of message columns, with the same schema as WhatsApp chats.
+    Service messages (joins, pins, calls...), messages without a sender and media without caption are skipped.
+
+    Args:
+        chat_file (TextIO): Text stream over the export.
+        block_size (int): Number of characters read at once.
+
+    Yields:
+        tuple[np.ndarray, list[str], list[str]]: Message timestamps (as datetime64), users and messages.
+    """
+    dates: list[str] = []
+    users: list[str] = []
+    messages: list[str] = []
+    for raw_message in iter_telegram_messages(chat_file, block_size):
+        if raw_message.get("type") != "message" or not raw_message.get("from"):
+            continue
+        message: str = flatten_text(raw_message.get("text", "")).strip()
+        if not message:
+            continue
+
+        dates.append(raw_message.get("date", ""))
+        users.append(str(raw_message["from"]).strip())
+        messages.append(message)
+        if len(messages) >= _BATCH_SIZE:
+            yield _to_batch(dates, users, messages)
+            dates, users, messages = [], [], []
+
+    if messages:
+        yield _to_batch(dates, users, messages)
+
+
+def _to_batch(dates: list[str], users: list[str], messages: list[str]) -> tuple[np.ndarray, list[str], list[str]]:
+    # Convert the batch's timestamps at once, skipping unparseable ones
+    timestamps: pd.DatetimeIndex = pd.DatetimeIndex(
+        pd.to_datetime(pd.Series(dates, dtype=object), format=_TELEGRAM_TIMESTAMP_FORMAT, errors="coerce")
+    )
+    valid: np.ndarray = timestamps.notna()
+    if not valid.all():
+        users = [user for user, keep in zip(users, valid) if keep]
+        messages = [message for message, keep in zip(messages, valid) if keep]
+    return timestamps[valid].values, users, messages
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from multiprocessing.connection import Client, Connection, Listener, arbitrary_address, default_family
+
+
+class WorkerProcess:
+    """
+    A worker process running `python -m <module>`, serving the app through a connection.
+
+    Workers are plain subprocesses rather than `multiprocessing` children, which would either import the Streamlit
+    script again (with every model library it pulls) or fork the threads of the server. The worker module calls
+    `serve` when run as a script, and the app connects to it on first use, so that it starts meanwhile.
+    """
+    def __init__(self, module: str) -> None:
+        """
+        Args:
+            module (str): Name of the worker module, within this package.
+        """
+        self.address: str = arbitrary_address(default_family)
+        self._authkey: bytes = os.urandom(32)
+        self._connection: Connection | None = None
+        # Whether installed or not, the worker imports this package from where the app does
+        package_root: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        python_path: str = os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")]))
+        self.process: subprocess.Popen = subprocess.Popen([sys.executable, "-m", module, self.address],
+                                                          stdin=subprocess.PIPE,
+                                                          env={**os.environ, "PYTHONPATH": python_path})
+        self.process.stdin.write(self._authkey)
+        self.process.stdin.close()
+
+    def connect(self, timeout: float = 30.0) -> Connection:
+        """
+        Connect to the worker process, waiting for it to start listening.
+
+        Args:
+            timeout (float): Seconds to wait for the worker.
+
+        Returns:
+            Connection: The connection to the worker.
+
+        Raises:
+            RuntimeError: If the worker exits or doesn't listen in time.
+        """
+        if self._connection is not None:
+            return self._connection
+        deadline: float = time.monotonic() + timeout
+        while True:
+            try:
+                self._connection = Client(self.address, authkey=self._authkey)
+                return self._connection
+            except OSError:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("the worker process could not be started")
+                time.sleep(0.01)
+
+    def close(self) -> None:
+        """
+        Stop the worker process.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self.process.kill()
+        self.process.wait()
+
+
+def serve(worker: Callable[[Connection], None]) -> None:
+    """
+    Run a worker loop in a worker process: wait for the app on the address given as argument, then serve it until
+    it disconnects.
+
+    Args:
+        worker (Callable[[Connection], None]): Worker loop, receiving requests from the connection to the app.
+    """
+    try:
+        with Listener(sys.argv[1], authkey=sys.stdin.buffer.read()) as listener:
+            with listener.accept() as app_connection:
+                worker(app_connection)
+    except (EOFError, OSError):
+        pass  # The app is gone, possibly before the worker could listen
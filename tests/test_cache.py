@@ -0,0 +1,110 @@
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatscroll import cache
+from chatscroll.cache import DiskCache, hash_chat, parse_chat_cached
+from chatscroll.parser import ChatData, ChatParser
+
+
+def test_parse_chat_cached(resolve_path, tmp_path, monkeypatch):
+    chat_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    upload = BytesIO(resolve_path("sample_chat.txt").read_bytes())
+    chat, key = parse_chat_cached(upload, chat_cache)
+
+    # Cache hits load the stored chat without parsing
+    monkeypatch.setattr(cache, "ChatParser", None)
+    cached_chat, cached_key = parse_chat_cached(upload, chat_cache)
+    assert cached_key == key
+    assert cached_chat.users == chat.users
+    assert np.array_equal(cached_chat.time, chat.time)
+    assert np.array_equal(cached_chat.user_codes, chat.user_codes)
+    assert cached_chat.message.equals(chat.message)
+    assert cached_chat[0] == chat[0]
+
+
+def test_lru_eviction(tmp_path):
+    def write(size):
+        return lambda path: (tmp_path / path / "data").write_bytes(b"x" * size)
+
+    disk_cache = DiskCache(str(tmp_path), max_bytes=250)
+    disk_cache.put("a", write(100))
+    disk_cache.put("b", write(100))
+    assert disk_cache.get("a") is not None  # "b" becomes the least recently used entry
+    disk_cache.put("c", write(100))
+    assert disk_cache.get("b") is None
+    assert disk_cache.get("a") is not None and disk_cache.get("c") is not None
+    assert disk_cache.put("d", write(300)) is None  # Entries over budget are not stored
+    assert not (tmp_path / "b").exists()
+
+
+def test_incremental_parsing(resolve_path, tmp_path, monkeypatch):
+    chat_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    export = resolve_path("sample_chat.txt").read_bytes()
+    old_export = b"".join(export.splitlines(keepends=True)[:300])
+    parse_chat_cached(BytesIO(old_export), chat_cache, block_size=1024)
+
+    # The new export only parses what follows the last checkpoint shared with the old one
+    resumed = []
+    resume = ChatParser.resume
+    monkeypatch.setattr(ChatParser, "resume", lambda self, *args: resumed.append(args) or resume(self, *args))
+    chat, _ = parse_chat_cached(BytesIO(export), chat_cache, block_size=1024)
+    offset, n_messages = resumed[0][:2]
+    assert len(old_export) - 1024 < offset < len(old_export)
+    assert 250 < n_messages < 300
+
+    expected = ChatParser(BytesIO(export)).chat
+    assert chat.users == expected.users
+    assert list(chat) == list(expected)
+
+    # Unrelated chats are parsed from scratch
+    other_export = export.replace(b"Alex", b"Robin")
+    chat, _ = parse_chat_cached(BytesIO(other_export), chat_cache, block_size=1024)
+    assert len(resumed) == 1
+    assert "Robin" in chat.users
+
+
+def test_other_parser_version_not_resumed(resolve_path, tmp_path, monkeypatch):
+    chat_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    export = resolve_path("sample_chat.txt").read_bytes()
+    parse_chat_cached(BytesIO(b"".join(export.splitlines(keepends=True)[:300])), chat_cache, block_size=1024)
+
+    # Chats parsed by an older parser are not extended, the new export is parsed from scratch
+    monkeypatch.setattr(cache, "PARSER_VERSION", "next")
+    resumed = []
+    monkeypatch.setattr(ChatParser, "resume", lambda self, *args: resumed.append(args))
+    chat, _ = parse_chat_cached(BytesIO(export), chat_cache, block_size=1024)
+    assert not resumed
+    assert list(chat) == list(ChatParser(BytesIO(export)).chat)
+
+
+def test_hash_chat(parse_chat):
+    chat = parse_chat("sample_chat.txt").chat
+    assert hash_chat(ChatData.concat([chat[:100], chat[100:]])) == hash_chat(chat)
+    assert hash_chat(chat[:-1]) != hash_chat(chat)
+    assert hash_chat(list(chat)) == hash_chat(list(chat)) != hash_chat(list(chat[1:]))
+
+
+def test_unsettled_prefix_not_resumed(tmp_path):
+    chat_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    lines = [f"1/{day}/24, {hour}:00 - Alex: message {day} {hour}\n" for day in range(1, 13) for hour in range(10, 22)]
+    parse_chat_cached(BytesIO("".join(lines).encode()), chat_cache, block_size=256)
+
+    # The older export could be day-first, the newer one parses again as month-first
+    chat, _ = parse_chat_cached(BytesIO("".join(lines + ["1/20/24, 10:00 - Sam: Later\n"]).encode()), chat_cache,
+                                block_size=256)
+    assert len(chat) == len(lines) + 1
+    assert chat[12]["time"] == pd.Timestamp(2024, 1, 2, 10)
+    assert chat[-1]["time"] == pd.Timestamp(2024, 1, 20, 10)
+
+
+def test_truncated_archive(resolve_path, tmp_path):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(resolve_path("sample_chat.txt"), "_chat.txt")
+    chat_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    with pytest.raises(ValueError, match="truncated or corrupted"):  # Reported by the app like unparseable chats
+        parse_chat_cached(BytesIO(archive.getvalue()[:-100]), chat_cache)
@@ -1,5 +1,228 @@
+import hashlib
+import json
+import os
+import sys
+import types
+import zipfile
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+
+import numpy as np
+import pytest
+
+from chatscroll.parser import ChatParser, parse_timestamp, sniff_timestamp_format, split_segment
+
+
+def assert_same_chat(chat, other):
+    assert chat.users == other.users
+    assert np.array_equal(chat.time, other.time)
+    assert np.array_equal(chat.user_codes, other.user_codes)
+    assert chat.message.equals(other.message)
+
+
 def test_parsing(parse_chat):
     parser = parse_chat("sample_chat.txt")
     assert len(parser.chat) == 495  # 500 messages - 5 media / status changes omitted
     assert len(parser.users) == 6   # 6 unique users
 
+
+def test_streaming_block_boundaries(resolve_path):
+    text = resolve_path("sample_chat.txt").read_text(encoding="utf-8")
+    text = "Messages are end-to-end encrypted.\n" + text.replace("Hey everyone!", "Hey\neveryone!\n")
+    expected = [  # Whole text parsed at once, one timestamp at a time
+        {"time": parse_timestamp(timestamp_str), "user": user, "message": message}
+        for timestamp_str, user, message in split_segment(text)
+    ]
+    assert len(expected) == 495
+    assert expected[0]["message"] == "Hey\neveryone!\n Any plans for the weekend?"
+    for block_size in (1, 7, 64, 1000):  # Tiny blocks split timestamps and multi-line messages
+        assert list(ChatParser(StringIO(text), block_size=block_size).chat) == expected
+        assert list(ChatParser(StringIO(text), block_size=block_size, lazy=True).iter_messages()) == expected
+
+
+def test_columnar_chat(parse_chat):
+    chat = parse_chat("sample_chat.txt").chat
+    assert chat[0] == {"time": datetime(2025, 7, 1, 10, 12), "user": "Alex", "message": "Hey everyone! Any plans for the weekend?"}
+    assert chat[-1]["user"] == "Chris"
+    assert list(chat[10:13]) == list(chat)[10:13]
+
+    # DataFrame columns are views on the parser arrays
+    df = chat.to_frame()
+    assert list(df.columns) == ["time", "user", "message"]
+    assert np.shares_memory(df["time"].values, chat.time)
+    assert np.shares_memory(df["user"].cat.codes.values, chat.user_codes)
+    assert list(df["user"].cat.categories) == chat.users
+    assert chat.nbytes < 64 * len(chat)
+
+
+@pytest.mark.parametrize("chat_name", ["WhatsApp Chat with Friends.txt", "_chat.txt"])
+def test_zipped_export(parse_chat, resolve_path, chat_name):
+    expected = parse_chat("sample_chat.txt").chat
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("IMG-20250701-WA0001.jpg", os.urandom(4096))
+        zf.write(resolve_path("sample_chat.txt"), chat_name)
+        zf.writestr("notes/readme.md", "not a chat")
+    assert_same_chat(ChatParser(archive).chat, expected)
+
+
+def test_damaged_zipped_export(resolve_path):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("IMG-20250701-WA0001.jpg", os.urandom(4096))
+        zf.write(resolve_path("sample_chat.txt"), "_chat.txt")
+    export = archive.getvalue()
+    member_offset = export.index(b"_chat.txt") + len("_chat.txt")
+    truncated = export[:len(export) // 2]
+    corrupted = export[:member_offset + 100] + bytes(100) + export[member_offset + 200:]
+    for damaged in (truncated, corrupted):
+        for lazy in (False, True):
+            with pytest.raises(ValueError, match="truncated or corrupted"):
+                list(ChatParser(BytesIO(damaged), lazy=lazy).iter_messages())
+
+
+def test_plain_binary_upload(parse_chat, resolve_path):
+    expected = parse_chat("sample_chat.txt").chat
+    assert_same_chat(ChatParser(BytesIO(resolve_path("sample_chat.txt").read_bytes())).chat, expected)
+
+
+def test_byte_buffers(parse_chat, resolve_path):
+    expected = parse_chat("sample_chat.txt").chat
+    export = resolve_path("sample_chat.txt").read_bytes()
+    for block_size in (1, 64, 1000):
+        assert_same_chat(ChatParser(export, block_size=block_size).chat, expected)
+        assert_same_chat(ChatParser(memoryview(export), block_size=block_size, workers=2).chat, expected)
+    with resolve_path("sample_chat.txt").open("rb") as f:  # Files on disk are memory-mapped
+        parser = ChatParser(f)
+        assert parser.buffer is not None
+        assert_same_chat(parser.chat, expected)
+
+    # Windows line breaks parse like the text path, which doesn't translate them either
+    windows_export = export.replace(b"\n", b"\r\n")
+    assert_same_chat(ChatParser(windows_export, block_size=64).chat, expected)
+    text_parser = ChatParser(StringIO(windows_export.decode("utf-8"), newline=""), block_size=64)
+    assert_same_chat(text_parser.chat, expected)
+
+    # Both paths record checkpoints as byte offsets into the export
+    for parser in (text_parser, ChatParser(windows_export, block_size=64)):
+        assert parser.checkpoints
+        for offset, _, digest in parser.checkpoints:
+            assert hashlib.sha256(windows_export[:offset]).hexdigest() == digest
+
+
+def test_telegram_export():
+    export = json.dumps({
+        "name": "Friends",
+        "type": "private_group",
+        "id": 4815162342,
+        "messages": [
+            {"id": 1, "type": "service", "date": "2025-07-01T10:00:00", "actor": "Alex", "action": "create_group"},
+            {"id": 2, "type": "message", "date": "2025-07-01T10:12:00", "from": "Alex", "text": "Hey everyone!"},
+            {"id": 3, "type": "message", "date": "2025-07-01T10:13:30", "from": "Jamie",
+             "text": ["Look at ", {"type": "link", "text": "https://example.com"}, " 👀"]},
+            {"id": 4, "type": "message", "date": "2025-07-01T10:14:00", "from": "Sam", "photo": "photos/1.jpg",
+             "text": ""},
+        ],
+    }, indent=1, ensure_ascii=False)
+    expected = [
+        {"time": datetime(2025, 7, 1, 10, 12), "user": "Alex", "message": "Hey everyone!"},
+        {"time": datetime(2025, 7, 1, 10, 13, 30), "user": "Jamie", "message": "Look at https://example.com 👀"},
+    ]
+    for block_size in (1, 16, 1 << 20):  # Blocks end inside keys, numbers and nested messages
+        parser = ChatParser(StringIO(export), app="telegram", block_size=block_size)
+        assert list(parser.chat) == expected
+        assert parser.users == ["Alex", "Jamie"]
+
+
+def test_timestamp_sniffing():
+    assert sniff_timestamp_format(["01.07.2025, 10:12", "02.07.2025, 23:59"]) == "%d.%m.%Y, %H:%M"
+    assert sniff_timestamp_format(["01/07/25, 10:12", "02/07/25, 23:59"]) == "%d/%m/%y, %H:%M"
+    assert sniff_timestamp_format(["7/1/25, 10:12 PM", "7/13/25, 9:05\u202fam"]) == "%m/%d/%y, %I:%M %p"
+
+
+def test_locale_variants():
+    text = (
+        "7/1/25, 10:12\u202fPM - Alex: Hey everyone!\n"
+        "7/2/25, 9:05 AM - Jamie: Not yet.\n"
+        "7/13/25, 12:30 AM - Sam: Not ambiguous anymore\n"
+        "7/14/25, 12:31 PM - Alex: Great\n"
+    )
+    parser = ChatParser(StringIO(text))
+    assert parser.timestamp_format == "%m/%d/%y, %I:%M %p"
+    assert [msg["time"] for msg in parser.chat] == [
+        datetime(2025, 7, 1, 22, 12), datetime(2025, 7, 2, 9, 5),
+        datetime(2025, 7, 13, 0, 30), datetime(2025, 7, 14, 12, 31)
+    ]
+
+    # Tiny blocks hold ambiguous batches back until a day above 12 settles the format
+    parser = ChatParser(StringIO(text), block_size=16)
+    assert parser.timestamp_format == "%m/%d/%y, %I:%M %p" and parser.timestamp_format_settled
+    assert parser.chat[1]["time"] == datetime(2025, 7, 2, 9, 5)
+    assert parser.chat[-1]["time"] == datetime(2025, 7, 14, 12, 31)
+
+
+def test_late_settled_timestamp_format():
+    # Twelve days of a month-first export fit day-first timestamps too, across many batches
+    lines = [f"1/{day}/24, {hour}:00 - Alex: message {day} {hour}" for day in range(1, 13) for hour in range(10, 22)]
+    text = "\n".join(lines + ["1/20/24, 10:00 - Sam: Not ambiguous anymore"]) + "\n"
+    for block_size, workers in [(64, 1), (2000, 1), (64, 2)]:
+        parser = ChatParser(StringIO(text), block_size=block_size, workers=workers)
+        assert parser.timestamp_format == "%m/%d/%y, %H:%M"
+        times = [msg["time"] for msg in parser.chat]
+        assert times[0] == datetime(2024, 1, 1, 10) and times[-1] == datetime(2024, 1, 20, 10)
+        assert times == sorted(times)
+
+    # Chats that never settle keep the day-first guess
+    parser = ChatParser(StringIO("\n".join(lines) + "\n"), block_size=64)
+    assert parser.timestamp_format == "%d/%m/%y, %H:%M" and not parser.timestamp_format_settled
+
+
+def synthetic_chat(n_lines):
+    start = datetime(2015, 1, 1)
+    lines = []
+    for i in range(n_lines):
+        if i % 7 == 3:  # Continuation line of a multi-line message
+            lines.append(f"line {i} of a longer message")
+        elif i % 101 == 0:  # System message
+            lines.append(f"{(start + timedelta(minutes=i)):%d/%m/%Y, %H:%M} - User {i % 13} joined")
+        else:
+            lines.append(f"{(start + timedelta(minutes=i)):%d/%m/%Y, %H:%M} - User {i % 13}: message number {i}")
+    return "\n".join(lines)
+
+
+def test_parallel_parsing_sample(resolve_path):
+    text = resolve_path("sample_chat.txt").read_text(encoding="utf-8")
+    serial = ChatParser(StringIO(text))
+    parallel = ChatParser(StringIO(text), block_size=2048, workers=4)
+    assert_same_chat(serial.chat, parallel.chat)
+    assert serial.users == parallel.users
+
+
+def test_parallel_parsing_skips_main_script(resolve_path, tmp_path, monkeypatch):
+    # Under Streamlit the main module is the app script, which workers must not run again
+    marker = tmp_path / "ran"
+    script = tmp_path / "app_script.py"
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+
+    text = resolve_path("sample_chat.txt").read_text(encoding="utf-8")
+    parallel = ChatParser(StringIO(text), block_size=2048, workers=2)
+    assert_same_chat(parallel.chat, ChatParser(StringIO(text)).chat)
+    assert sys.modules["__main__"] is main
+    assert not marker.exists()
+
+
+@pytest.mark.parametrize("n_lines", [
+    200_000,
+    pytest.param(10_000_000, marks=pytest.mark.skipif(
+        not os.environ.get("CHATSCROLL_SLOW_TESTS"), reason="Set CHATSCROLL_SLOW_TESTS to parse a 10M-line chat"
+    )),
+])
+def test_parallel_parsing_synthetic(n_lines):
+    text = synthetic_chat(n_lines)
+    serial = ChatParser(StringIO(text), block_size=1 << 18)
+    parallel = ChatParser(StringIO(text), block_size=1 << 18, workers=4)
+    assert len(serial.chat) == sum(1 for i in range(n_lines) if i % 7 != 3 and i % 101 != 0)
+    assert_same_chat(serial.chat, parallel.chat)
@@ -0,0 +1,92 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from chatscroll import plots
+from chatscroll.plots import FigureCache, WordcloudRenderer, plot_msg_over_days, plot_msg_over_hours
+
+
+def test_figure_cache():
+    def build(n_hours):
+        built.append(n_hours)
+        return plot_msg_over_hours(pd.DataFrame({"hour": range(n_hours), "msg": range(n_hours)}))
+
+    built = []
+    figure_size = len(build(24).to_json())
+    figures = FigureCache(max_bytes=2 * figure_size)
+    first = figures.get_or_build(("chat", "msg_over_hours", 24), lambda: build(24))
+    hit = figures.get_or_build(("chat", "msg_over_hours", 24), lambda: build(24))
+    assert json.loads(hit.to_json()) == json.loads(first.to_json())
+    assert built == [24, 24]  # Hits don't build again
+
+    # Hits hand out copies, edits to them don't reach the cache
+    first.update_layout(title="edited")
+    assert figures.get_or_build(("chat", "msg_over_hours", 24), lambda: build(24)).layout.title.text != "edited"
+
+    # Least recently used figures are evicted once over budget
+    figures.get_or_build(("chat", "msg_over_hours", 23), lambda: build(23))
+    figures.get_or_build(("chat", "msg_over_hours", 24), lambda: build(24))
+    figures.get_or_build(("chat", "msg_over_hours", 22), lambda: build(22))
+    assert len(figures) == 2 and figures.nbytes <= figures.max_bytes
+    figures.get_or_build(("chat", "msg_over_hours", 24), lambda: build(24))
+    assert built == [24, 24, 23, 22]
+    figures.get_or_build(("chat", "msg_over_hours", 23), lambda: build(23))
+    assert built == [24, 24, 23, 22, 23]
+
+
+def test_plots_leave_input_untouched():
+    df_by_hours = pd.DataFrame({"hour": range(24), "msg": range(24)})
+    plot_msg_over_hours(df_by_hours)
+    assert list(df_by_hours.columns) == ["hour", "msg"]
+
+
+def test_msg_over_days_downsampling():
+    df_by_date = pd.DataFrame({"date": pd.date_range("2010-01-01", periods=5000), "msg": np.arange(5000) % 7})
+    fig = plot_msg_over_days(df_by_date, max_points=1000)
+    assert fig.data[0].type == "scattergl" and len(fig.data[0].x) == 1000
+
+    fig = plot_msg_over_days(df_by_date.iloc[:1000], max_points=1000)
+    assert fig.data[0].type == "scatter" and len(fig.data[0].x) == 1000
+
+
+def test_wordcloud_renderer():
+    frequencies = [("hello", 10), ("world", 5), ("chat", 2)]
+    renderer = WordcloudRenderer(max_images=2)
+    full = renderer.render(frequencies)
+    assert renderer.render(frequencies) is full  # Renders in flight or done are shared
+    assert full.result().size == (800, 400)
+    assert renderer.render(frequencies, preview=True).result().size == (400, 200)
+
+    # Done renders past the limit are forgotten, least recently used first
+    renderer.render(frequencies[:2]).result()
+    assert renderer.render(frequencies, preview=True).done()
+    assert renderer.render(frequencies) is not full
+
+
+def test_wordcloud_renderer_supersedes(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    render_wordcloud = plots.render_wordcloud
+
+    def blocking_render(*args):
+        started.set()
+        release.wait()
+        return render_wordcloud(*args)
+
+    monkeypatch.setattr(plots, "render_wordcloud", blocking_render)
+    renderer = WordcloudRenderer(max_workers=1)
+    blocker = renderer.render([("busy", 1)])
+    assert started.wait(10)
+
+    # Scrubbing queues one render per slot, superseded ones are cancelled before they start
+    first = renderer.render([("hello", 10)], slot="session")
+    other_slot = renderer.render([("world", 5)], slot="other session")
+    latest = renderer.render([("hello", 10), ("world", 5)], slot="session")
+    assert first.cancelled() and not other_slot.cancelled()
+    assert renderer.render([("hello", 10), ("world", 5)], slot="session") is latest
+
+    release.set()
+    assert latest.result().size == (800, 400) and other_slot.result() and blocker.result()
+    assert not renderer.render([("hello", 10)]).cancelled()  # Cancelled renders are started again
@@ -1,7 +1,16 @@
+import os
 from datetime import datetime
 
+import numpy as np
+import pytest
 from langchain.schema import Document
-from chatscroll.rag import ChatSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from rank_bm25 import BM25Okapi
+
+from chatscroll import rag
+from chatscroll.cache import DiskCache
+from chatscroll.rag import ChatSplitter, FAISSRetriever, SimpleRetriever
+from config.loader import SplitterConfig
 
 
 def test_chunking(parse_chat):
@@ -25,3 +34,109 @@ def test_truncate_message():
         }
     ])
     assert chunks[0].page_content == f"2020-01-01 00:00 - Alice: {'X'*50}..."  # long_msg cut to max_message_length
+
+
+def test_simple_retriever(parse_chat):
+    chat = parse_chat("sample_chat.txt").chat
+    retriever = SimpleRetriever(chat, k=8, splitter_config=SplitterConfig(chunk_size=4, chunk_overlap=1))
+    texts = [chunk.page_content for chunk in retriever.chunks]
+    reference = BM25Okapi([text.split() for text in texts])
+
+    # Same best scores as LangChain's BM25Retriever, k is not capped to its 4 default results
+    for query in ["road trip this weekend", "Sam: on the beach", "Picnic on Saturday?"]:
+        scores = reference.get_scores(query.split())
+        found = [texts.index(text) for text in retriever.retrieve(query).split("\n\n")]
+        assert len(found) == min(8, np.count_nonzero(scores))
+        assert np.allclose(scores[found], np.sort(scores)[::-1][:len(found)])
+    assert retriever.retrieve("unknownword") == ""
+
+
+def test_simple_retriever_cache(parse_chat, tmp_path, monkeypatch):
+    chat = parse_chat("sample_chat.txt").chat
+    index_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    config = SplitterConfig(chunk_size=4, chunk_overlap=1)
+    retriever = SimpleRetriever(chat, k=5, splitter_config=config, index_cache=index_cache, chat_key="chat")
+
+    # Cached indexes are opened without splitting the chat again, and retrieve the same chunks
+    with monkeypatch.context() as m:
+        m.setattr(ChatSplitter, "split_messages", None)
+        cached = SimpleRetriever(chat, k=5, splitter_config=config, index_cache=index_cache, chat_key="chat")
+        for query in ["road trip this weekend", "Sam: on the beach", "nothing"]:
+            assert cached.retrieve(query) == retriever.retrieve(query)
+    assert len(index_cache.keys()) == 1
+
+    # Other splitter configs and tokenizations have their own indexes
+    SimpleRetriever(chat, k=5, splitter_config=SplitterConfig(chunk_size=4, chunk_overlap=2),
+                    index_cache=index_cache, chat_key="chat")
+    monkeypatch.setattr(rag, "TOKENIZER_VERSION", rag.TOKENIZER_VERSION + 1)
+    SimpleRetriever(chat, k=5, splitter_config=config, index_cache=index_cache, chat_key="chat")
+    assert len(index_cache.keys()) == 3
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="Needs the memory maps of the process")
+def test_simple_retriever_cache_mapped(parse_chat, tmp_path):
+    chat = parse_chat("sample_chat.txt").chat
+    index_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    config = SplitterConfig(chunk_size=4, chunk_overlap=1)
+    SimpleRetriever(chat, k=5, splitter_config=config, index_cache=index_cache, chat_key="chat")
+    cached = SimpleRetriever(chat, k=5, splitter_config=config, index_cache=index_cache, chat_key="chat")
+
+    # Loaded terms and texts are read in place from the mapped index files, not copied into memory
+    mapped = {}
+    with open("/proc/self/maps") as maps:
+        for line in maps:
+            fields = line.split()
+            if len(fields) == 6 and fields[5].startswith(str(tmp_path)):
+                start, end = (int(address, 16) for address in fields[0].split("-"))
+                mapped.setdefault(os.path.basename(fields[5]), []).append((start, end))
+    for name, strings in [("terms.arrow", cached.terms), ("texts.arrow", cached.texts)]:
+        for buffer in strings.buffers()[1:]:
+            assert any(start <= buffer.address and buffer.address + buffer.size <= end
+                       for start, end in mapped.get(name, []))
+
+
+def test_faiss_retriever_cache(parse_chat, tmp_path, monkeypatch):
+    chat = parse_chat("sample_chat.txt").chat
+    index_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    config = SplitterConfig(chunk_size=4, chunk_overlap=1)
+    monkeypatch.setattr(rag, "HuggingFaceEmbeddings", lambda model_name, **kwargs: DeterministicFakeEmbedding(size=8))
+    retriever = FAISSRetriever(chat, 3, config, "model-a", index_cache=index_cache)
+
+    # Cached indexes are loaded without embedding the chunks again
+    with monkeypatch.context() as m:
+        m.setattr(rag.FAISS, "from_documents", None)
+        cached = FAISSRetriever(chat, 3, config, "model-a", index_cache=index_cache)
+        assert cached.retrieve("road trip") == retriever.retrieve("road trip")
+
+    # Chat, splitter config and embeddings model changes all make new indexes
+    FAISSRetriever(chat[:-1], 3, config, "model-a", index_cache=index_cache)
+    FAISSRetriever(chat, 3, SplitterConfig(chunk_size=5, chunk_overlap=1), "model-a", index_cache=index_cache)
+    FAISSRetriever(chat, 3, config, "model-b", index_cache=index_cache)
+    assert len([key for key in index_cache.keys() if not key.startswith("embeddings-")]) == 4
+
+
+def test_incremental_faiss_indexing(parse_chat, tmp_path, monkeypatch):
+    chat = parse_chat("sample_chat.txt").chat
+    index_cache = DiskCache(str(tmp_path), max_bytes=2**30)
+    config = SplitterConfig(chunk_size=4, chunk_overlap=1)
+    embedded = []
+
+    class Embeddings(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            embedded.extend(texts)
+            return super().embed_documents(texts)
+
+    monkeypatch.setattr(rag, "HuggingFaceEmbeddings", lambda model_name, **kwargs: Embeddings(size=8))
+    FAISSRetriever(chat[:300], 3, config, "model-a", index_cache=index_cache)
+    assert len(embedded) == 100
+
+    # A longer export of the same chat only embeds its new chunks
+    embedded.clear()
+    retriever = FAISSRetriever(chat, 3, config, "model-a", index_cache=index_cache)
+    assert 0 < len(embedded) <= (len(chat) - 300) // 3 + 2
+    assert retriever.retrieve("road trip") == FAISSRetriever(chat, 3, config, "model-a").retrieve("road trip")
+
+    # Vectors of other models are not reused
+    embedded.clear()
+    FAISSRetriever(chat[:300], 3, config, "model-b", index_cache=index_cache)
+    assert len(embedded) == 100
@@ -0,0 +1,165 @@
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from rank_bm25 import BM25Okapi
+
+from chatscroll import search
+from chatscroll.sandbox import QueryTooExpensive, RegexSandbox
+from chatscroll.search import BM25, SearchIndex, page_at, required_literals, result_page, within
+from chatscroll.stats import ChatIndex, TermMatrix, build_chat_frame
+
+
+def test_required_literals():
+    assert required_literals("weekend") == ["weekend"]
+    assert required_literals(r"Picnic\?+ on (beach|park)s") == ["picnic", "?", " on ", [["beach"], ["park"]], "s"]
+    assert required_literals(r"\d+ ?pm") == ["pm"]
+    assert required_literals("a.c") == ["a", "c"]
+    with pytest.raises(re.error):
+        required_literals("(unclosed")
+
+
+def test_search(parse_chat):
+    df = build_chat_frame(parse_chat("sample_chat.txt").chat)
+    index = SearchIndex(df["message"], TermMatrix(df["message"]))
+
+    # Same matches as scanning every message, in message order
+    for query in ["weekend", "WEEKEND", "picnic on", r"\?", "!!", "what's", r"\d+ ?pm", "(beach|park) ", "e.d",
+                  "se(e|a)", "x", "nothing like this", "🎉", "ing!"]:
+        expected = np.flatnonzero(df["message"].str.contains(query, flags=re.IGNORECASE, na=False).to_numpy(bool))
+        assert index.search(query).tolist() == expected.tolist(), query
+
+    # Literal fragments narrow the candidates to a superset of the matches
+    candidates = index.candidates("picnic on (sat|sun)")
+    assert 0 < len(candidates) < len(df)
+    assert set(index.search("picnic on (sat|sun)")) <= set(candidates)
+    assert index.candidates(r"\d+") is None
+
+
+def test_search_empty_messages():
+    messages = pd.Series(["", "ok", "", "Okay then"])
+    index = SearchIndex(messages, TermMatrix(messages))
+    assert index.search("ok").tolist() == [1, 3]
+    assert index.search("then").tolist() == [3]
+    assert index.search("ay t").tolist() == [3]
+
+
+def test_trigram_blocks(parse_chat, monkeypatch):
+    messages = build_chat_frame(parse_chat("sample_chat.txt").chat)["message"]
+    monkeypatch.setattr(search, "_TRIGRAM_BLOCK", 7)  # Trigrams repeat within and across blocks
+    trigrams, indptr, rows = SearchIndex._build_trigrams(messages)
+
+    # Same postings as collecting the trigrams of every message
+    expected = {}
+    for row, message in enumerate(messages.str.lower()):
+        for i in range(len(message) - 2):
+            expected.setdefault(message[i:i + 3], set()).add(row)
+    codes = [(int(t) >> 42, (int(t) >> 21) & 0x1FFFFF, int(t) & 0x1FFFFF) for t in trigrams]
+    assert {"".join(map(chr, c)): rows[start:stop].tolist()
+            for c, start, stop in zip(codes, indptr[:-1], indptr[1:])} == \
+        {trigram: sorted(found) for trigram, found in expected.items()}
+
+
+def test_result_pages():
+    rows = np.array([2, 3, 5, 8, 13, 21, 34])
+    assert result_page(rows, 0, 3).tolist() == [34, 21, 13]
+    assert result_page(rows, 2, 3).tolist() == [2]
+    assert result_page(rows, 3, 3).tolist() == []
+    assert np.concatenate([result_page(rows, page, 3) for page in range(3)]).tolist() == rows[::-1].tolist()
+
+    # Jumping to a message lands on the page with the newest result before it
+    assert page_at(rows, 14, 3) == 0
+    assert page_at(rows, 13, 3) == 1
+    assert page_at(rows, 3, 3) == 2
+    assert page_at(rows, 0, 3) == 2
+    assert page_at(rows, 100, 3) == 0
+
+
+def test_bm25(parse_chat):
+    df = build_chat_frame(parse_chat("sample_chat.txt").chat)
+    terms = TermMatrix(df["message"])
+    reference = BM25Okapi([terms.analyzer(message) for message in df["message"]])
+    bm25 = BM25(terms.counts)
+
+    # Same scores as rank_bm25 for the messages containing any query term, in the same order
+    for query in ["weekend picnic", "the the beach", "road trip this weekend", "nothing matches xyz"]:
+        expected = reference.get_scores(terms.analyzer(query))
+        columns = np.searchsorted(terms.terms, [w for w in terms.analyzer(query) if w in set(terms.terms)])
+        rows, scores = bm25.scores(columns)
+        assert rows.tolist() == np.flatnonzero(expected).tolist()
+        assert np.allclose(scores, expected[rows])
+
+        top, top_scores = bm25.top_k(columns, 5)
+        assert np.allclose(top_scores, np.sort(expected)[::-1][:len(top)])
+
+
+def test_ranked_search(parse_chat):
+    df = build_chat_frame(parse_chat("sample_chat.txt").chat)
+    index = ChatIndex(df)
+    search_index = SearchIndex(df["message"], TermMatrix(df["message"]))
+    rows, scores = search_index.rank("Road trip this weekend", 3)
+    assert len(rows) == 3 and (np.diff(scores) <= 0).all()
+    assert "road trip this weekend" in df["message"].iloc[rows[0]].lower()
+
+    # Filters are applied before scoring
+    sam_rows = index.user_rows("Sam", date(2025, 7, 1), date(2025, 10, 18))
+    rows, _ = search_index.rank("weekend", 10, sam_rows)
+    assert len(rows) > 0 and (df["user"].iloc[rows] == "Sam").all()
+    rows, _ = search_index.rank("weekend", 10, index.date_range(date(2025, 10, 1), date(2025, 10, 18)))
+    assert len(rows) > 0 and (df["date"].iloc[rows] >= pd.Timestamp(2025, 10, 1)).all()
+    assert search_index.rank("unknownword", 10)[0].tolist() == []
+
+
+def test_within():
+    positions = np.array([1, 4, 6, 9])
+    assert positions[within(positions, slice(4, 9))].tolist() == [4, 6]
+    assert positions[within(positions, np.array([0, 6, 9, 12]))].tolist() == [6, 9]
+    assert positions[within(positions, np.array([], dtype=np.int64))].tolist() == []
+
+
+def test_sandboxed_search():
+    messages = pd.Series(["hello there"] * 300 + ["a" * 40 + "!"] + ["hello again"] * 300)
+    search_index = SearchIndex(messages, TermMatrix(messages))
+    sandbox = RegexSandbox(pa.array(messages), time_budget=2, chunk_size=100)
+
+    def scan(query):
+        return np.sort(np.concatenate(list(search_index.stream(query, sandbox=sandbox)))).tolist()
+
+    try:
+        # Matches stream in by chunks, newest first
+        chunks = list(search_index.stream("h.llo", sandbox=sandbox))
+        assert len(chunks) == 6 and chunks[0].tolist() == list(range(501, 601))
+        assert scan("h.llo") == search_index.search("h.llo").tolist()
+
+        # Catastrophic backtracking runs out of time after streaming the newer chunks, and doesn't block later searches
+        found = []
+        with pytest.raises(QueryTooExpensive):
+            for chunk in search_index.stream("(a|aa)+$|again", sandbox=sandbox):
+                found.extend(chunk)
+        assert sorted(found) == list(range(301, 601))
+        assert scan("th.re") == list(range(300))
+
+        # Unfinished searches are cancelled
+        stream = search_index.stream("h.l+o", sandbox=sandbox)
+        next(stream)
+        stream.close()
+        assert scan("ag.in") == list(range(301, 601))
+
+        # Invalid patterns fail before anything is yielded, and errors in the worker don't stop it
+        with pytest.raises(re.error):
+            next(search_index.stream("(?<=a+)b", sandbox=sandbox))
+        with pytest.raises(re.error):
+            list(sandbox.scan("(?<=a+)b", np.arange(len(messages))))
+        assert scan("h.llo") == search_index.search("h.llo").tolist()
+
+        # A dead worker is replaced
+        sandbox._worker.process.kill()
+        sandbox._worker.process.wait()
+        with pytest.raises(RuntimeError):
+            scan("h.llo")
+        assert scan("h.llo") == search_index.search("h.llo").tolist()
+    finally:
+        sandbox.close()
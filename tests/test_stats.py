@@ -0,0 +1,133 @@
+from datetime import date
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+from chatscroll.parser import ChatParser
+from chatscroll.stats import ChatIndex, TermMatrix, build_chat_frame, build_rollup, date_slice, extract_emojis, \
+    lttb
+
+
+def test_chat_frame(parse_chat):
+    chat = parse_chat("sample_chat.txt").chat
+    df = build_chat_frame(chat)
+    assert len(df) == len(chat)
+
+    # Vectorized columns match their row-wise definitions
+    assert (df["date"].dt.date == df["time"].dt.date).all()
+    assert (df["weekday"].astype(str) == df["time"].dt.day_name()).all()
+    assert (df["hour"] == df["time"].dt.hour).all()
+    assert df["word_count"].tolist() == [len(message.split()) for message in df["message"]]
+    assert df["char_count"].tolist() == [len(message) for message in df["message"]]
+
+
+def test_word_counts_unicode():
+    text = (
+        "01/07/2025, 10:12 - Alex: spaced out\tand wide 👋🏽 words\n"
+        "01/07/2025, 10:13 - Sam: single\n"
+    )
+    df = build_chat_frame(ChatParser(StringIO(text)).chat)
+    assert df["word_count"].tolist() == [6, 1]
+    assert df["char_count"].tolist() == [len("spaced out\tand wide 👋🏽 words"), len("single")]
+
+
+def test_rollup(parse_chat):
+    df = build_chat_frame(parse_chat("sample_chat.txt").chat)
+    rollup = build_rollup(df)
+    assert len(rollup) < len(df)
+    assert rollup["date"].is_monotonic_increasing
+
+    # Sums over the cube answer the same questions as groupbys over the messages
+    assert rollup["msg"].sum() == len(df)
+    for column in ["user", "date", "hour", "year_month", "weekday"]:
+        expected = df.groupby(column, observed=True).agg(
+            msg=("message", "size"), words=("word_count", "sum"), chars=("char_count", "sum")
+        )
+        actual = rollup.groupby(column, observed=True)[["msg", "words", "chars"]].sum()
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_chat_index(parse_chat):
+    df = build_chat_frame(parse_chat("sample_chat.txt").chat)
+    index = ChatIndex(df)
+    for start, end in [(date(2025, 7, 1), date(2025, 10, 18)), (date(2025, 7, 2), date(2025, 8, 31)),
+                       (date(2025, 8, 1), date(2025, 8, 1)), (date(2026, 1, 1), date(2026, 2, 1))]:
+        in_range = (df["date"] >= pd.Timestamp(start)) & (df["date"] <= pd.Timestamp(end))
+        assert df.iloc[index.date_range(start, end)].equals(df[in_range])
+        for user in df["user"].cat.categories:
+            assert df.take(index.user_rows(user, start, end)).equals(df[in_range & (df["user"] == user)])
+
+    rollup = build_rollup(df)
+    rows = date_slice(rollup["date"].to_numpy(), date(2025, 8, 1), date(2025, 8, 31))
+    assert rollup.iloc[rows].equals(rollup[rollup["year_month"] == pd.Period("2025-08", "M")])
+
+
+def test_unsorted_chat_frame():
+    text = (
+        "02/07/2025, 09:00 - Alex: later on the day\n"
+        "01/07/2025, 10:13 - Sam: earlier\n"
+    )
+    df = build_chat_frame(ChatParser(StringIO(text)).chat)
+    assert df["message"].tolist() == ["earlier", "later on the day"]
+    assert df.index.tolist() == [0, 1]
+    assert df["word_count"].tolist() == [1, 4]
+    assert df["char_count"].tolist() == [7, 16]
+
+
+def test_word_frequencies(parse_chat):
+    df = build_chat_frame(parse_chat("sample_chat.txt").chat)
+    index = ChatIndex(df)
+    terms = TermMatrix(df["message"])
+
+    def fit_frequencies(messages, stopwords):
+        # Reference: tokenize the filtered messages again and sort the whole vocabulary
+        vectorizer = CountVectorizer(lowercase=True, stop_words=stopwords)
+        counts = vectorizer.fit_transform(messages).sum(axis=0).A1
+        return sorted(zip(vectorizer.get_feature_names_out(), counts), key=lambda x: x[1], reverse=True)
+
+    for stopwords in ["english", ["ll", "the", "we"], None]:
+        for rows in [index.date_range(date(2025, 7, 2), date(2025, 9, 30)),
+                     index.user_rows("Sam", date(2025, 7, 1), date(2025, 10, 18))]:
+            expected = fit_frequencies(df["message"].iloc[rows].tolist(), stopwords)
+            for n in (1, 10, 200):  # Ties at the cut keep alphabetical order
+                assert terms.word_frequencies(rows, stopwords, n) == [(str(w), int(c)) for w, c in expected[:n]]
+    assert terms.word_frequencies(index.date_range(date(2026, 1, 1), date(2026, 2, 1)), None, 10) == []
+
+
+def test_extract_emojis():
+    # ZWJ sequences, skin tones, flags and keycaps are whole emojis, plain digits and symbols are not
+    text = "Family 👨‍👩‍👧‍👦 👍🏽👍 🇪🇸🇫🇷 at 10:30 #1 1️⃣ ❤️❤ © 🏳️‍🌈 🧑🏾‍💻"
+    assert extract_emojis(text) == ["👨‍👩‍👧‍👦", "👍🏽", "👍", "🇪🇸", "🇫🇷", "1️⃣", "❤️", "❤", "©", "🏳️‍🌈", "🧑🏾‍💻"]
+    assert extract_emojis("no emojis here, just 100% text") == []
+
+
+def test_emoji_frequencies():
+    text = (
+        "01/07/2025, 10:12 - Alex: 👍🏽👍🏽 great 👨‍👩‍👧\n"
+        "01/07/2025, 10:13 - Sam: 👍🏽 ok\n"
+        "02/07/2025, 09:00 - Alex: no emojis\n"
+        "03/07/2025, 09:00 - Sam: 🇪🇸!\n"
+    )
+    df = build_chat_frame(ChatParser(StringIO(text)).chat)
+    emojis = TermMatrix(df["message"], analyzer=extract_emojis)
+    index = ChatIndex(df)
+    assert emojis.word_frequencies(slice(None), None, 10) == [("👍🏽", 3), ("🇪🇸", 1), ("👨‍👩‍👧", 1)]
+    assert emojis.word_frequencies(index.user_rows("Sam", date(2025, 7, 1), date(2025, 7, 2)), None, 10) == [
+        ("👍🏽", 1)
+    ]
+    assert emojis.word_frequencies(index.date_range(date(2025, 7, 2), date(2025, 7, 2)), None, 10) == []
+
+
+def test_lttb():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2015-01-01", periods=3650).to_numpy()
+    counts = rng.poisson(5, len(dates))
+    counts[1234] = 500
+
+    kept = lttb(dates, counts, 500)
+    assert len(kept) == 500 and (np.diff(kept) > 0).all()
+    assert kept[0] == 0 and kept[-1] == len(dates) - 1
+    assert 1234 in kept  # Peaks survive downsampling
+    assert (lttb(dates, counts, 5000) == np.arange(len(dates))).all()
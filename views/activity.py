@@ -1,39 +1,28 @@
 import streamlit as st
-import pandas as pd
 
 from dateutil.relativedelta import relativedelta
 
 from chatscroll.plots import plot_msg_over_time, plot_user_msg_stats, plot_msg_over_days, plot_msg_over_hours
 
 
-def get_df(chat):
-    df = pd.DataFrame(chat)
-    df["date"] = df["time"].dt.date
-    df["year_month"] = df["time"].dt.to_period("M")
-    df["year"] = df["time"].dt.year
-    df["weekday"] = df["time"].dt.day_name()
-    df["hour"] = df["time"].dt.hour
-    df["word_count"] = df["message"].apply(lambda x: len(str(x).split()))
-    df["char_count"] = df["message"].apply(lambda x: len(str(x)))
-    return df
-
-
 def activity():
-    # Init page and load df
+    # Init page and load the user/date/hour rollup, all activity stats are sums over it
     st.header("Activity")
-    df = get_df(st.session_state["chat"])
+    rollup = st.session_state["rollup"]
+    figures, chat_key = st.session_state["figure_cache"], st.session_state["chat_key"]
 
     # General overview
     st.subheader(f"📊 Overview of _{st.session_state['chatname']}_") # TODO: chat name
 
     # Calculations for first row
-    start_date = df["time"].min().date()
-    end_date = df["time"].max().date()
+    start_date = rollup["date"].iloc[0].date()
+    end_date = rollup["date"].iloc[-1].date()
+    n_messages = rollup["msg"].sum()
     range_bd = relativedelta(end_date, start_date)
 
     # Add first row of metrics
     c11, c12, c13 = st.columns(3)
-    c11.metric("Messages", len(df))
+    c11.metric("Messages", n_messages)
     c12.metric("Active users", len(st.session_state["users"]))
     c13.metric(
         "Date range", f"{start_date} to {end_date}",
@@ -42,15 +31,15 @@ def activity():
 
     # Calculations for second row
     range_days = (end_date - start_date).days + 1
-    df_by_date = df.groupby('date').agg(msg=('message', 'count'))
+    df_by_date = rollup.groupby('date').agg(msg=('msg', 'sum'))
     most_active_day = df_by_date.msg.idxmax()
     most_active_count = df_by_date.msg.max()
 
     # Second row of metrics
     c21, c22, c23 = st.columns(3)
-    c21.metric("Messages per day",  f"{len(df) / range_days:.2f}")
-    c22.metric("% Active days", f"{(len(df['date'].unique()) / range_days)*100:.2f}%")
-    c23.metric("Most active day", f"{most_active_day}", help=f"**{most_active_count}** messages were sent on that day")
+    c21.metric("Messages per day",  f"{n_messages / range_days:.2f}")
+    c22.metric("% Active days", f"{(len(df_by_date) / range_days)*100:.2f}%")
+    c23.metric("Most active day", f"{most_active_day.date()}", help=f"**{most_active_count}** messages were sent on that day")
 
     # User/time period messaging stats
     st.subheader("🗣️📆 Who's talking... and when?")
@@ -61,17 +50,27 @@ def activity():
             "<h6 style='text-align: left; font-weight: bold;'>User messaging statistics</h6>",
             unsafe_allow_html=True
         )
-        st.plotly_chart(plot_user_msg_stats(df), use_container_width=True)
+        st.plotly_chart(
+            figures.get_or_build((chat_key, "user_msg_stats"), lambda: plot_user_msg_stats(rollup)),
+            use_container_width=True
+        )
     with p12:
         st.markdown(
             "<h6 style='text-align: left; font-weight: bold;'>Messages by time period</h6>",
             unsafe_allow_html=True
         )
-        st.plotly_chart(plot_msg_over_time(df), use_container_width=True)
+        st.plotly_chart(
+            figures.get_or_build((chat_key, "msg_over_time"), lambda: plot_msg_over_time(rollup)),
+            use_container_width=True
+        )
 
     # Daily messages plot
-    st.plotly_chart(plot_msg_over_days(df_by_date.reset_index()), use_container_width=True)
+    st.plotly_chart(
+        figures.get_or_build((chat_key, "msg_over_days"), lambda: plot_msg_over_days(df_by_date.reset_index())),
+        use_container_width=True
+    )
 
     # Hourly messages plot
-    df_by_hours = df.groupby('hour').agg(msg=('message', 'count')).reset_index()
-    st.plotly_chart(plot_msg_over_hours(df_by_hours))
\ No newline at end of file
+    st.plotly_chart(figures.get_or_build((chat_key, "msg_over_hours"), lambda: plot_msg_over_hours(
+        rollup.groupby('hour').agg(msg=('msg', 'sum')).reset_index()
+    )))
\ No newline at end of file
@@ -11,15 +11,19 @@ from config.loader import load_config, AppConfig
 
 
 @st.cache_resource
-def get_retriever_cached(chat, config_json: str):
+def get_retriever_cached(_chat, chat_key: str, config_json: str, _index_cache):
+    # The chat is identified by its cache key rather than hashed by Streamlit on every call
     config = AppConfig.model_validate_json(config_json)
 
     if config.retriever.retrieval_method == "simple":
-        return SimpleRetriever(passages=chat, k=config.retriever.k, splitter_config=config.splitter)
+        return SimpleRetriever(passages=_chat, k=config.retriever.k, splitter_config=config.splitter,
+                               index_cache=_index_cache, chat_key=chat_key)
     elif config.retriever.retrieval_method == "FAISS":
-        return FAISSRetriever(passages=chat, k=config.retriever.k, splitter_config=config.splitter,
-                              embeddings_model=config.retriever.embeddings_model)
-    return SimpleRetriever(passages=chat, k=config.retriever.k, splitter_config=config.splitter)
+        return FAISSRetriever(passages=_chat, k=config.retriever.k, splitter_config=config.splitter,
+                              embeddings_model=config.retriever.embeddings_model,
+                              index_cache=_index_cache, chat_key=chat_key)
+    return SimpleRetriever(passages=_chat, k=config.retriever.k, splitter_config=config.splitter,
+                           index_cache=_index_cache, chat_key=chat_key)
 
 
 def get_retriever(config_json: str):
@@ -29,7 +33,7 @@ def get_retriever(config_json: str):
 
     # Otherwise, build retriever once and store it
     chat = st.session_state["chat"]
-    retriever = get_retriever_cached(chat, config_json)
+    retriever = get_retriever_cached(chat, st.session_state["chat_key"], config_json, st.session_state["index_cache"])
     st.session_state["retriever"] = retriever
     return retriever
 
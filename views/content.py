@@ -1,26 +1,22 @@
 import re
+from collections import Counter
 
-import pandas as pd
 import streamlit as st
 
-from chatscroll.plots import get_word_frequencies, get_emoji_frequencies, plot_wordcloud, plot_top_n_emojis
-
-
-def get_df(chat):
-    df = pd.DataFrame(chat)
-    df["date"] = df["time"].dt.date
-    df["word_count"] = df["message"].apply(lambda x: len(str(x).split()))
-    df["char_count"] = df["message"].apply(lambda x: len(str(x)))
-    return df
+from chatscroll.plots import plot_top_n_emojis
+from views.resources import get_emojis, get_terms
+from views.widgets import show_wordcloud
 
 
 def content():
     # Init page and load df
     st.header("Content")
-    df = get_df(st.session_state["chat"])
+    df = st.session_state["df"]
+    index = st.session_state["index"]
+    figures, chat_key = st.session_state["figure_cache"], st.session_state["chat_key"]
 
     # Calendar selector to filter date range
-    start_date, end_date = df["date"].min(), df["date"].max()
+    start_date, end_date = df["date"].iloc[0].date(), df["date"].iloc[-1].date()
     date_range = st.date_input(
         label="Select a date range to filter messages",
         value=(start_date, end_date),
@@ -33,9 +29,9 @@ def content():
     elif isinstance(date_range, tuple) and len(date_range) == 1:
         start_date = date_range[0]  # Only 1 element selected, fallback to start of range to maximum
 
-    # Filter df according to selected values
-    date_df = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
-    if len(date_df) == 0:
+    # Slice the time-sorted df according to selected values
+    date_rows = index.date_range(start_date, end_date)
+    if date_rows.stop <= date_rows.start:
         st.error("Looks like there were no messages sent during that time range. Try selecting different dates before "
                  "continuing.")
         st.stop()
@@ -58,8 +54,8 @@ def content():
         stopwords = None
 
     # Extract word frequencies according to stopword selection and emoji frequencies and plot
-    word_freqs = get_word_frequencies(date_df, stopwords)
-    emoji_freqs = get_emoji_frequencies(date_df)
+    word_freqs = get_terms().word_frequencies(date_rows, stopwords, 200)
+    emoji_freqs = Counter(dict(get_emojis().word_frequencies(date_rows, None, 10)))
     p11, p12 = st.columns(2)
 
     with p11:
@@ -68,7 +64,9 @@ def content():
             unsafe_allow_html=True
         )
         if emoji_freqs:
-            st.plotly_chart(plot_top_n_emojis(emoji_freqs, 10), use_container_width=True)
+            st.plotly_chart(figures.get_or_build(
+                (chat_key, "top_n_emojis", 10, start_date, end_date), lambda: plot_top_n_emojis(emoji_freqs, 10)
+            ), use_container_width=True)
         else:
             st.warning("😶‍🌫️ No emojis found! 🕵️‍♀️ Perhaps try a different date range? 📅")
     with p12:
@@ -81,6 +79,10 @@ def content():
                 "Number of words to display",
                 min_value=5, max_value=200, value=100, step=1
             )
-            st.pyplot(plot_wordcloud(dict(word_freqs[:n_words_slider])), use_container_width=True)
+            preview = st.toggle("Quick preview", value=True,
+                                help="Show a low resolution wordcloud while the full one is being drawn")
+
+            # Wordclouds are drawn in the background, show the last one (or a preview) until the new one is ready
+            show_wordcloud(word_freqs[:n_words_slider], preview, "content_wordcloud")
         else:
             st.warning("No words to show right now. Try a different date range or change your stopword list.")
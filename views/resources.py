@@ -0,0 +1,33 @@
+import streamlit as st
+
+from chatscroll.search import SearchIndex
+from chatscroll.stats import TermMatrix, extract_emojis
+
+# Chats whose indexes are kept in memory at once, shared by every session on them
+MAX_CACHED_CHATS = 4
+
+
+@st.cache_resource(max_entries=MAX_CACHED_CHATS, show_spinner="Counting words...")
+def _get_term_matrix(chat_key, _messages, emojis):
+    # The chat is identified by its cache key rather than hashed by Streamlit on every call
+    return TermMatrix(_messages, analyzer=extract_emojis if emojis else None)
+
+
+def get_terms():
+    # Word counts of the session's chat, built on first use by the pages needing them
+    return _get_term_matrix(st.session_state["chat_key"], st.session_state["df"]["message"], False)
+
+
+def get_emojis():
+    # Emoji counts of the session's chat, built on first use by the pages needing them
+    return _get_term_matrix(st.session_state["chat_key"], st.session_state["df"]["message"], True)
+
+
+@st.cache_resource(max_entries=MAX_CACHED_CHATS, show_spinner="Indexing messages...")
+def _get_search_index(chat_key, _messages, _terms):
+    return SearchIndex(_messages, _terms)
+
+
+def get_search_index():
+    # Search indexes of the session's chat, built on the first search
+    return _get_search_index(st.session_state["chat_key"], st.session_state["df"]["message"], get_terms())
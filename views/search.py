@@ -1,32 +1,141 @@
-import pandas as pd
+import os
+import re
+from contextlib import closing
+
+import numpy as np
+import pyarrow as pa
 import streamlit as st
 
+from chatscroll.sandbox import QueryTooExpensive, RegexSandbox
+from chatscroll.search import page_at, result_page
+from views.resources import get_search_index
+
+# Search results shown per page, and best ranked results shown
+PAGE_SIZE = 50
+RANKED_RESULTS = 50
 
-def get_df(chat):
-    df = pd.DataFrame(chat)
-    return df
+# Seconds a regex search may run for, see `RegexSandbox`
+SANDBOX_TIME_BUDGET = float(os.environ.get("CHATSCROLL_REGEX_TIMEOUT", 5))
 
 
 def search():
-    # Init page and load df
+    # Init page and load df, indexing its messages on the first search
     st.header("Search")
-    df = get_df(st.session_state["chat"])
+    df = st.session_state["df"]
+    index = st.session_state["index"]
+    search_index = get_search_index()
+    if "regex_sandbox" not in st.session_state:
+        st.session_state["regex_sandbox"] = RegexSandbox(pa.array(df["message"].array), SANDBOX_TIME_BUDGET)
 
-    # Prompt search query
+    # Prompt search query, search mode and filters
     query = st.text_input(
         "Type a keyword or phrase to search in your chat messages",
-        help="**Tip:** You can use regular expressions!"
+        help="**Tip:** You can use regular expressions in exact mode!"
+    )
+    c1, c2, c3 = st.columns([1, 2, 2])
+    mode = c1.radio(
+        "Search mode", ["Exact", "Ranked"], horizontal=True,
+        help="**Exact** finds every message matching your query, newest first. **Ranked** finds the messages most "
+             "relevant to its words (BM25 scores), best first."
+    )
+    selected_users = c2.multiselect("Users", st.session_state["users"], placeholder="All users")
+    start_date, end_date = df["date"].iloc[0].date(), df["date"].iloc[-1].date()
+    date_range = c3.date_input(
+        label="Date range",
+        value=(start_date, end_date),
+        min_value=start_date,
+        max_value=end_date,
+        format="MM.DD.YYYY",
     )
+    if isinstance(date_range, tuple) and len(date_range) == 2:
+        start_date, end_date = date_range
+    elif isinstance(date_range, tuple) and len(date_range) == 1:
+        start_date = date_range[0]  # Only 1 element selected, fallback to start of range to maximum
+
+    # Rows passing the filters, searches only look within them
+    if selected_users:
+        filter_rows = np.sort(np.concatenate([index.user_rows(u, start_date, end_date) for u in selected_users]))
+    else:
+        filter_rows = index.date_range(start_date, end_date)
+
+    # Rank the best messages for the query words
+    if query and mode == "Ranked":
+        rows, scores = search_index.rank(query, RANKED_RESULTS, filter_rows)
+        if len(rows) == 0:
+            st.warning("Sorry, we did not find any messages with the words of your query.")
+            st.stop()
+
+        results = df.take(rows).reset_index(drop=True)
+        results["score"] = scores
+        results = results.rename(columns={
+            "time": "Time",
+            "user": "User",
+            "message": "Message",
+            "score": "Score"
+        })[["Time", "User", "Message", "Score"]]
+        st.markdown(f"#### 🕵️‍♀️ Top {len(results)} messages for your query")
+        st.dataframe(results, use_container_width=True, hide_index=True,
+                     column_config={"Score": st.column_config.NumberColumn(format="%.2f")})
 
     # Execute search query if something was written
-    if query:
-        results = df[df["message"].str.contains(query, case=False, na=False)]
-        if len(results) == 0:
+    elif query:
+        # Search again only when the query or filters change, not when moving through pages
+        if st.session_state.get("search_query") != (query, selected_users, start_date, end_date):
+            # Only messages containing the query's literal text are matched against it, regexes in the sandbox.
+            # Matches stream in newest first, the search is cancelled if the query changes meanwhile
+            found, too_expensive = [], False
+            progress = st.empty()
+            try:
+                with closing(search_index.stream(query, filter_rows, st.session_state["regex_sandbox"])) as chunks:
+                    for chunk in chunks:
+                        found.append(chunk)
+                        progress.caption(f"⏳ Searching... {sum(map(len, found))} messages found so far")
+            except re.error as e:
+                st.error(f"Sorry, that is not a valid regular expression: {e}.")
+                st.stop()
+            except QueryTooExpensive:
+                too_expensive = True
+            except RuntimeError:
+                st.error("⚠️ Sorry, the search could not run this time. Please try again.")
+                st.stop()
+            progress.empty()
+            st.session_state["search_query"] = (query, selected_users, start_date, end_date)
+            st.session_state["search_rows"] = np.sort(np.concatenate([np.zeros(0, dtype=np.int64), *found]))
+            st.session_state["search_too_expensive"] = too_expensive
+            st.session_state["search_page"] = 0
+        rows = st.session_state["search_rows"]
+
+        if st.session_state["search_too_expensive"]:
+            st.warning(f"⏱️ This query is too expensive, it ran for more than {SANDBOX_TIME_BUDGET:g} seconds. "
+                       f"Showing only the messages found until then, try a simpler regular expression for the rest.")
+        if len(rows) == 0:
             st.warning("Sorry, we did not find any messages matching your query.")
             st.stop()
 
-        # Order by descending time and rename columns
-        results = results.sort_values("time", ascending=False).reset_index(drop=True)
+        n_pages = (len(rows) - 1) // PAGE_SIZE + 1
+        st.markdown(f"#### 🕵️‍♀️ Found {len(rows)} messages matching your query")
+
+        # Page controls, callbacks update the page before it is displayed
+        def move(step):
+            st.session_state["search_page"] = min(max(st.session_state["search_page"] + step, 0), n_pages - 1)
+
+        def jump():
+            if st.session_state["search_jump"] is not None:
+                day = st.session_state["search_jump"]
+                st.session_state["search_page"] = page_at(rows, index.date_range(day, day).stop, PAGE_SIZE)
+
+        c1, c2, c3, c4 = st.columns([1, 2, 1, 2], vertical_alignment="bottom")
+        c1.button("◀ Newer", on_click=move, args=(-1,), disabled=st.session_state["search_page"] == 0,
+                  use_container_width=True)
+        c2.markdown(f"<p style='text-align: center;'>Page {st.session_state['search_page'] + 1} of {n_pages}</p>",
+                    unsafe_allow_html=True)
+        c3.button("Older ▶", on_click=move, args=(1,), disabled=st.session_state["search_page"] == n_pages - 1,
+                  use_container_width=True)
+        c4.date_input("Jump to date", value=None, key="search_jump", on_change=jump,
+                      min_value=df["date"].iloc[0].date(), max_value=df["date"].iloc[-1].date(), format="MM.DD.YYYY")
+
+        # Only the messages of the current page are taken from the chat, newest first, and renamed
+        results = df.take(result_page(rows, st.session_state["search_page"], PAGE_SIZE)).reset_index(drop=True)
         results = results.rename(columns={
             "time": "Time",
             "user": "User",
@@ -34,6 +143,4 @@ def search():
         })[["Time", "User", "Message"]]
 
         # Display resulting dataframe without index
-        # TODO: pretty paginated view
-        st.markdown(f"#### 🕵️‍♀️ Found {len(results)} messages matching your query")
-        st.dataframe(results, use_container_width=True, hide_index=True)
\ No newline at end of file
+        st.dataframe(results, use_container_width=True, hide_index=True)
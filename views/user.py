@@ -1,36 +1,28 @@
 import re
+from collections import Counter
 
-import pandas as pd
 import streamlit as st
 
-from chatscroll.plots import get_word_frequencies, plot_wordcloud, plot_msg_over_time, get_emoji_frequencies, \
+from chatscroll.plots import plot_msg_over_time, \
     plot_msg_over_days, plot_msg_over_hours
-
-
-def get_df(chat):
-    df = pd.DataFrame(chat)
-    df["date"] = df["time"].dt.date
-    df["year_month"] = df["time"].dt.to_period("M")
-    df["year"] = df["time"].dt.year
-    df["weekday"] = df["time"].dt.day_name()
-    df["hour"] = df["time"].dt.hour
-    df["word_count"] = df["message"].apply(lambda x: len(str(x).split()))
-    df["char_count"] = df["message"].apply(lambda x: len(str(x)))
-    return df
+from chatscroll.stats import date_slice
+from views.resources import get_emojis, get_terms
+from views.widgets import show_wordcloud
 
 
 def user():
-    # Init page and load df
+    # Init page and load precomputed chat stats
     st.header("User")
-    df = get_df(st.session_state["chat"])
+    rollup = st.session_state["rollup"]
+    index = st.session_state["index"]
+    figures, chat_key = st.session_state["figure_cache"], st.session_state["chat_key"]
 
-    # Start user selectbox (default selected by alphabetical order) and filter df
-    users = sorted(df["user"].unique())
+    # Start user selectbox (default selected by alphabetical order)
+    users = st.session_state["users"]
     selected_user = st.selectbox("Select a user", users)
-    user_df = df[df["user"] == selected_user]
 
     # Calendar selector to filter date range
-    start_date, end_date = df["date"].min(), df["date"].max()
+    start_date, end_date = rollup["date"].iloc[0].date(), rollup["date"].iloc[-1].date()
     date_range = st.date_input(
         label="Select a date range to filter messages",
         value=(start_date, end_date),
@@ -43,10 +35,11 @@ def user():
     elif isinstance(date_range, tuple) and len(date_range) == 1:
         start_date = date_range[0]  # Only 1 element selected, fallback to start of range to maximum
 
-    # Filter dfs according to selected values
-    date_df = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
-    date_user_df = user_df[(user_df["date"] >= start_date) & (user_df["date"] <= end_date)]
-    if len(date_user_df) == 0:
+    # Slice rollups according to selected values, and find the user's messages for word and emoji counts
+    date_rollup = rollup.iloc[date_slice(rollup["date"].to_numpy(), start_date, end_date)]
+    date_user_rollup = date_rollup[date_rollup["user"] == selected_user]
+    date_user_rows = index.user_rows(selected_user, start_date, end_date)
+    if len(date_user_rollup) == 0:
         st.error("Looks like there were no messages sent during that time range. Try selecting different dates before "
                  "continuing.")
         st.stop()
@@ -69,32 +62,33 @@ def user():
         stopwords = None
 
     # Extract word frequencies according to stopword selection and emoji frequencies
-    word_freqs = get_word_frequencies(date_user_df, stopwords)
-    emoji_freqs = get_emoji_frequencies(date_user_df)
+    word_freqs = get_terms().word_frequencies(date_user_rows, stopwords, 200)
+    emoji_freqs = Counter(dict(get_emojis().word_frequencies(date_user_rows, None, 1)))
 
     # General overview
     st.subheader(f"👤 Overview of _{selected_user}_")
 
     # First row of metrics
     c11, c12, c13 = st.columns(3)
-    c11.metric("User messages", len(date_user_df),
-               help=f"**{date_user_df['word_count'].mean():.2f}** avg. words per message"
-                    f"\n\n**{date_user_df['char_count'].mean():.2f}** avg. characters per message"
+    user_messages = date_user_rollup["msg"].sum()
+    c11.metric("User messages", user_messages,
+               help=f"**{date_user_rollup['words'].sum() / user_messages:.2f}** avg. words per message"
+                    f"\n\n**{date_user_rollup['chars'].sum() / user_messages:.2f}** avg. characters per message"
                )
-    c12.metric("Participation (% of total messages)", f"{(len(date_user_df) / len(date_df)) * 100:.2f}%")
-    c13.metric("Active days", len(date_user_df.date.unique()),
-               help=f"**{len(date_user_df.date.unique()) / len(date_df.date.unique()) * 100:.2f}%** of days when "
+    c12.metric("Participation (% of total messages)", f"{(user_messages / date_rollup['msg'].sum()) * 100:.2f}%")
+    c13.metric("Active days", date_user_rollup.date.nunique(),
+               help=f"**{date_user_rollup.date.nunique() / date_rollup.date.nunique() * 100:.2f}%** of days when "
                     f"someone participated in the chat")
 
     # Second row of metrics
     c21, c22, c23 = st.columns(3)
-    c21.metric("Last message date", date_user_df["date"].max().strftime("%Y-%m-%d"))
+    c21.metric("Last message date", date_user_rollup["date"].iloc[-1].strftime("%Y-%m-%d"))
     if word_freqs:
         top_word, top_word_count = word_freqs[0]
         c22.metric("Top word", f"{top_word}", help=f"Sent **{top_word_count}** times")
     else:
         c22.metric("Top word", "None", help="**Warning**: No words outside stopword list!")
-    if emoji_freqs:  # TODO: correct bug with multilayered emojis
+    if emoji_freqs:
         top_emoji, top_emoji_count = emoji_freqs.most_common(1)[0]
         c23.metric("Top emoji", f"{top_emoji}", help=f"Sent **{top_emoji_count}** times")
     else:
@@ -114,7 +108,11 @@ def user():
                 "Number of words to display",
                 min_value=5, max_value=200, value=100, step=1
             )
-            st.pyplot(plot_wordcloud(dict(word_freqs[:n_words_slider])), use_container_width=True)
+            preview = st.toggle("Quick preview", value=True,
+                                help="Show a low resolution wordcloud while the full one is being drawn")
+
+            # Wordclouds are drawn in the background, show the last one (or a preview) until the new one is ready
+            show_wordcloud(word_freqs[:n_words_slider], preview, "user_wordcloud")
         else:
             st.warning("No words to show right now. Try a different date range or change your stopword list.")
     with p12:
@@ -122,15 +120,22 @@ def user():
             "<h6 style='text-align: left; font-weight: bold;'>Messages by time period</h6>",
             unsafe_allow_html=True
         )
-        st.plotly_chart(plot_msg_over_time(date_user_df), use_container_width=True)
+        st.plotly_chart(figures.get_or_build(
+            (chat_key, "msg_over_time", selected_user, start_date, end_date),
+            lambda: plot_msg_over_time(date_user_rollup)
+        ), use_container_width=True)
 
     # Daily messages plot
-    filtered_df_by_date = date_user_df.groupby('date').agg(msg=('message', 'count')).reset_index()
-    st.plotly_chart(plot_msg_over_days(filtered_df_by_date), use_container_width=True)
+    st.plotly_chart(figures.get_or_build(
+        (chat_key, "msg_over_days", selected_user, start_date, end_date),
+        lambda: plot_msg_over_days(date_user_rollup.groupby('date').agg(msg=('msg', 'sum')).reset_index())
+    ), use_container_width=True)
 
     # Hourly messages plot
-    filtered_df_by_hours = date_user_df.groupby('hour').agg(msg=('message', 'count')).reset_index()
-    st.plotly_chart(plot_msg_over_hours(filtered_df_by_hours))
+    st.plotly_chart(figures.get_or_build(
+        (chat_key, "msg_over_hours", selected_user, start_date, end_date),
+        lambda: plot_msg_over_hours(date_user_rollup.groupby('hour').agg(msg=('msg', 'sum')).reset_index())
+    ))
 
     # TODO:
     # User top emojis
@@ -0,0 +1,47 @@
+import uuid
+
+import streamlit as st
+
+# Seconds between checks for a wordcloud being drawn
+WORDCLOUD_POLL_INTERVAL = 0.25
+
+
+def show_wordcloud(frequencies, preview, state_key):
+    """
+    Show a wordcloud without waiting for it to be drawn.
+
+    Wordclouds are drawn in the background by the session's `WordcloudRenderer`. Until the new image is ready, the
+    quick preview (if enabled and already drawn) or the last image shown under `state_key` takes its place, and a
+    fragment checks for the new image every `WORDCLOUD_POLL_INTERVAL` seconds. The script itself never waits, so
+    reruns (e.g. from the next slider tick) are never held back by a render, and each new wordcloud cancels the
+    session's previous one if it hasn't started drawing yet.
+
+    Args:
+        frequencies (list[tuple[str, int]]): (word, frequency) tuples to show.
+        preview (bool): Whether to show a low resolution wordcloud while the full one is drawn.
+        state_key (str): Session state key keeping the last full image shown.
+    """
+    renderer = st.session_state["wordcloud_renderer"]
+    slot = (st.session_state.setdefault("wordcloud_session", uuid.uuid4().hex), state_key)
+    wordcloud = renderer.render(frequencies, slot=slot)
+    quick_wordcloud = renderer.render(frequencies, preview=True, slot=slot) if preview else None
+    polling = not wordcloud.done()
+
+    def draw():
+        if any(future is not None and future.cancelled() for future in (wordcloud, quick_wordcloud)):
+            st.rerun()  # Superseded in another session showing the same wordcloud, request it again
+        if wordcloud.done():
+            st.image(wordcloud.result(), use_container_width=True)
+            st.session_state[state_key] = wordcloud.result()
+            if polling:
+                st.rerun()  # Full rerun, registering the fragment again without polling
+            return
+
+        if quick_wordcloud is not None and quick_wordcloud.done():
+            st.image(quick_wordcloud.result(), use_container_width=True)
+        elif st.session_state.get(state_key) is not None:
+            st.image(st.session_state[state_key], use_container_width=True)
+        else:
+            st.caption("🎨 Drawing the wordcloud...")
+
+    st.fragment(draw, run_every=WORDCLOUD_POLL_INTERVAL if polling else None)()